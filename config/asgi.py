@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Avisa o settings que o servidor é ASGI (ver CONN_MAX_AGE)
+os.environ.setdefault('MEU_FINANCEIRO_ASGI', '1')
 
 application = get_asgi_application()
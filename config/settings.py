@@ -30,6 +30,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Consultas e tempos de cada requisição (Server-Timing e página /metricas/)
+    'lancamentos.metricas.MetricasMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,10 +63,46 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# SQLite ajustado para vários processos/threads (medido com `manage.py benchmark_concorrencia`):
+# - WAL: leituras não esperam as escritas (e vice-versa); synchronous=NORMAL é seguro com WAL;
+# - cache de ~20 MB por conexão, mmap de 128 MB e até 5 s esperando um lock antes do "database is locked";
+# - conexões persistentes (CONN_MAX_AGE), em vez de abrir o arquivo e aplicar os PRAGMAs a cada requisição.
+#   Só no WSGI: no ASGI o ORM roda nas threads do executor do sync_to_async, cada uma com a sua
+#   conexão, que o fim da requisição não fecha com segurança. Lá (config/asgi.py define
+#   MEU_FINANCEIRO_ASGI) a conexão é fechada ao fim de cada requisição, como o Django recomenda;
+# - BEGIN IMMEDIATE nas transações: a escrita pega o lock no início, em vez de falhar no meio
+#   ao tentar promover um lock de leitura (o que o busy_timeout não resolve).
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA cache_size=-20000;'
+    'PRAGMA mmap_size=134217728;'
+    'PRAGMA busy_timeout=5000;'
+    'PRAGMA temp_store=MEMORY;'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # MEU_FINANCEIRO_DB aponta outro arquivo (usado pelos benchmarks que sobem um servidor)
+        'NAME': os.environ.get('MEU_FINANCEIRO_DB') or BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 0 if os.environ.get('MEU_FINANCEIRO_ASGI') else 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Cache
+# Os dados de cada usuário entram no cache com a versão dos dados na chave (ver lancamentos/versao.py),
+# então trocar o backend (ex.: Redis) não exige nenhuma lógica de invalidação.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'meu-financeiro',
     }
 }
 
@@ -3,14 +3,28 @@ from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 # Importação completa de todos os modelos
-from .models import Categoria, Lancamento, CategoriaPadrao, Receita, Perfil, CartaoDeCredito
+from .models import Categoria, Lancamento, CategoriaPadrao, Receita, Perfil, CartaoDeCredito, Parcela, RegraCategoria
+from .parcelas import reconstruir_parcelas
+from .meses import reconstruir_meses
+from .versao import marcar_alteracao
+from .categorias import provisionar_categorias
 
 # --- FERRAMENTA DE MIGRAÇÃO DE DADOS (Usuário) ---
 def criar_acao_de_migracao(nome_de_usuario_destino):
     def migrar_dados(modeladmin, request, queryset):
         try:
             novo_dono = User.objects.get(username=nome_de_usuario_destino)
+            donos_anteriores = set(queryset.values_list('user_id', flat=True))
+            # Os ids antes do update(): filtros da lista (ex.: por usuário) deixam de casar depois dele
+            ids_migrados = list(queryset.values_list('pk', flat=True))
             itens_atualizados = queryset.update(user=novo_dono)
+            # O update() não dispara sinais: as parcelas e o índice de meses guardam o usuário
+            if queryset.model in (Lancamento, Receita):
+                if queryset.model is Lancamento:
+                    reconstruir_parcelas(Lancamento.objects.filter(pk__in=ids_migrados))
+                for user_id in donos_anteriores | {novo_dono.pk}:
+                    reconstruir_meses(user_id)
+            marcar_alteracao(*donos_anteriores, novo_dono.pk)
             messages.success(request, f'{itens_atualizados} itens foram migrados com sucesso para o usuário "{novo_dono.username}".')
         except User.DoesNotExist:
             messages.error(request, f'ERRO: O usuário "{nome_de_usuario_destino}" não foi encontrado no banco de dados.')
@@ -47,7 +61,12 @@ def migrar_lancamentos_para_cartao(modeladmin, request, queryset):
         cartao__isnull=True
     )
     
+    ids_migrados = list(lancamentos_para_migrar.values_list('pk', flat=True))
     count = lancamentos_para_migrar.update(cartao=cartao_destino)
+    # O update() não dispara sinais: regera as parcelas com as datas do novo cartão
+    reconstruir_parcelas(Lancamento.objects.filter(pk__in=ids_migrados))
+    for user_id in set(Lancamento.objects.filter(pk__in=ids_migrados).values_list('user_id', flat=True)):
+        reconstruir_meses(user_id)
     
     if count > 0:
         messages.success(request, f"{count} lançamento(s) de crédito foi(ram) migrado(s) para o cartão '{cartao_destino.nome}'.")
@@ -89,62 +108,43 @@ class CartaoDeCreditoAdmin(admin.ModelAdmin):
     list_filter = ('user',)
     search_fields = ('nome', 'user__username')
 
+@admin.register(RegraCategoria)
+class RegraCategoriaAdmin(admin.ModelAdmin):
+    list_display = ('padrao', 'categoria', 'prioridade', 'user')
+    list_filter = ('user',)
+    search_fields = ('padrao', 'categoria__nome', 'user__username')
+    list_select_related = ('categoria', 'user')
+
+@admin.register(Parcela)
+class ParcelaAdmin(admin.ModelAdmin):
+    list_display = ('lancamento', 'numero', 'data_vencimento', 'valor', 'cartao', 'categoria', 'user')
+    list_filter = ('cartao', 'user')
+    search_fields = ('lancamento__local_compra', 'user__username')
+    date_hierarchy = 'data_vencimento'
+    list_select_related = ('lancamento', 'cartao', 'categoria', 'user')
+
 # --- FERRAMENTAS DE GERENCIAMENTO DE USUÁRIOS ---
+# As duas ações usam o provisionamento em lote (ver lancamentos/categorias.py)
 @admin.action(description='Popular com categorias padrão (apenas as que faltam)')
 def popular_categorias_padrao(modeladmin, request, queryset):
-    categorias_padrao = CategoriaPadrao.objects.all()
-    if not categorias_padrao.exists():
+    if not CategoriaPadrao.objects.exists():
         messages.warning(request, 'Nenhuma Categoria Padrão foi cadastrada para popular.')
         return
-    usuarios_atualizados = 0
-    categorias_criadas_total = 0
-    for user in queryset:
-        categorias_criadas_para_usuario = 0
-        for cat_padrao in categorias_padrao:
-            if not Categoria.objects.filter(user=user, nome=cat_padrao.nome).exists():
-                try:
-                    Categoria.objects.create(nome=cat_padrao.nome, macro_categoria=cat_padrao.macro_categoria, exemplos=cat_padrao.exemplos, user=user)
-                    categorias_criadas_para_usuario += 1
-                except Exception as e:
-                     messages.error(request, f'Erro ao criar categoria {cat_padrao.nome} para {user.username}: {e}')
-        if categorias_criadas_para_usuario > 0:
-            usuarios_atualizados += 1
-            categorias_criadas_total += categorias_criadas_para_usuario
-    if usuarios_atualizados > 0:
-        messages.success(request, f'{usuarios_atualizados} usuário(s) atualizado(s). Total de {categorias_criadas_total} nova(s) categoria(s) criada(s).')
+    resultado = provisionar_categorias(queryset.values_list('pk', flat=True))
+    if resultado['usuarios']:
+        messages.success(request, f"{len(resultado['usuarios'])} usuário(s) atualizado(s). Total de {resultado['criadas']} nova(s) categoria(s) criada(s).")
     else:
         messages.info(request, 'Nenhuma categoria precisou ser adicionada para os usuários selecionados (eles já estavam atualizados ou não havia categorias padrão).')
 
 @admin.action(description='Atualizar categorias existentes com os dados padrão')
 def atualizar_categorias_com_padrao(modeladmin, request, queryset):
-    categorias_padrao = CategoriaPadrao.objects.all()
-    mapa_padrao = {cat.nome: cat for cat in categorias_padrao}
-    if not mapa_padrao:
+    if not CategoriaPadrao.objects.exists():
         messages.warning(request, 'Nenhuma Categoria Padrão foi cadastrada para usar como base.')
         return
-    categorias_atualizadas_count = 0
-    usuarios_processados = 0
-    for user in queryset:
-        usuarios_processados += 1
-        categorias_do_usuario = Categoria.objects.filter(user=user)
-        for cat_usuario in categorias_do_usuario:
-            if cat_usuario.nome in mapa_padrao:
-                cat_padrao_correspondente = mapa_padrao[cat_usuario.nome]
-                atualizou = False
-                if cat_usuario.macro_categoria != cat_padrao_correspondente.macro_categoria:
-                    cat_usuario.macro_categoria = cat_padrao_correspondente.macro_categoria
-                    atualizou = True
-                if cat_usuario.exemplos != cat_padrao_correspondente.exemplos:
-                    cat_usuario.exemplos = cat_padrao_correspondente.exemplos
-                    atualizou = True
-                if atualizou:
-                    try:
-                        cat_usuario.save()
-                        categorias_atualizadas_count += 1
-                    except Exception as e:
-                        messages.error(request, f'Erro ao atualizar categoria {cat_usuario.nome} para {user.username}: {e}')
-    if categorias_atualizadas_count > 0:
-        messages.success(request, f'{categorias_atualizadas_count} categoria(s) foram atualizada(s) com sucesso nos {usuarios_processados} usuário(s) selecionado(s).')
+    user_ids = list(queryset.values_list('pk', flat=True))
+    resultado = provisionar_categorias(user_ids, criar=False, atualizar=True)
+    if resultado['atualizadas'] > 0:
+        messages.success(request, f"{resultado['atualizadas']} categoria(s) foram atualizada(s) com sucesso nos {len(user_ids)} usuário(s) selecionado(s).")
     else:
         messages.info(request, 'Nenhuma categoria correspondente foi encontrada para ser atualizada nos usuários selecionados.')
 
@@ -0,0 +1,108 @@
+# Dentro de lancamentos/agregacoes.py
+import heapq
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Sum
+from .models import Lancamento, Parcela
+from .meses import intervalo_do_mes
+from .versao import versao_dos_dados
+
+# Por quanto tempo os totais de um mês ficam no cache (a versão dos dados já invalida)
+TEMPO_NO_CACHE = 60 * 60
+
+# --- TOTAIS DOS DASHBOARDS (POR CATEGORIA E POR MACRO CATEGORIA) ---
+# Os dois dashboards e qualquer combinação de métodos de pagamento saem da mesma
+# base: os gastos do mês agrupados por método, categoria e macro categoria. A base
+# é calculada uma vez por usuário/mês/versão dos dados e guardada no cache.
+
+def _gastos_por_metodo(user, ano, mes):
+    """ {metodo: [(categoria, macro_categoria, total)]} de todos os métodos de pagamento. """
+    inicio, fim = intervalo_do_mes(ano, mes)
+    por_metodo = {}
+    avista = (Lancamento.objects
+        .filter(user=user, data_compra__gte=inicio, data_compra__lt=fim)
+        .exclude(metodo_pagamento='Crédito')
+        .values('metodo_pagamento', 'categoria__nome', 'categoria__macro_categoria')
+        .annotate(total=Sum('valor_total')).order_by())
+    for item in avista:
+        por_metodo.setdefault(item['metodo_pagamento'], []).append(
+            (item['categoria__nome'], item['categoria__macro_categoria'], item['total'] or Decimal('0.0')))
+    credito = (Parcela.objects
+        .filter(user=user, cartao__isnull=False, data_vencimento__gte=inicio, data_vencimento__lt=fim)
+        .values('categoria__nome', 'categoria__macro_categoria')
+        .annotate(total=Sum('valor')).order_by())
+    por_metodo['Crédito'] = [(item['categoria__nome'], item['categoria__macro_categoria'], item['total'] or Decimal('0.0')) for item in credito]
+    return por_metodo
+
+def gastos_por_metodo(user, ano, mes):
+    chave = f'gastos_por_metodo:{user.pk}:{ano}-{mes:02d}:v{versao_dos_dados(user.pk)}'
+    por_metodo = cache.get(chave)
+    if por_metodo is None:
+        por_metodo = _gastos_por_metodo(user, ano, mes)
+        cache.set(chave, por_metodo, TEMPO_NO_CACHE)
+    return por_metodo
+
+def gastos_do_mes(user, ano, mes, metodos):
+    """ {'categoria': {nome: total}, 'macro_categoria': {macro: total}} somando só os métodos informados. """
+    por_metodo = gastos_por_metodo(user, ano, mes)
+    por_categoria, por_macro = {}, {}
+    # Gastos à vista primeiro e o crédito por último, como nos dashboards originais
+    for metodo in sorted(set(metodos), key=lambda m: (m == 'Crédito', metodos.index(m))):
+        for categoria, macro, total in por_metodo.get(metodo, []):
+            por_categoria[categoria] = por_categoria.get(categoria, Decimal('0.0')) + total
+            por_macro[macro] = por_macro.get(macro, Decimal('0.0')) + total
+    return {'categoria': por_categoria, 'macro_categoria': por_macro}
+
+async def agastos_do_mes(user, ano, mes, metodos):
+    return await sync_to_async(gastos_do_mes)(user, ano, mes, metodos)
+
+# --- DETALHES (DRILL-DOWN) DOS DASHBOARDS ---
+# As linhas saem ordenadas do banco (à vista por data da compra, parcelas pela data da
+# compra do lançamento) e as duas listas são intercaladas com heapq.merge, sem
+# formatar e reinterpretar datas para ordenar. Por padrão a data vai em ISO e o
+# valor em centavos inteiros; formato='br' mantém os campos formatados de antes.
+AGRUPAMENTOS = ('categoria', 'macro_categoria')
+FORMATOS = ('iso', 'br')
+
+def _linha(local, descricao, data_compra, valor, tipo, formato):
+    if formato == 'br':
+        campo_valor = 'valor_total' if tipo == 'avista' else 'valor_parcela'
+        return {'local': local, 'data_compra': data_compra.strftime('%d/%m/%Y'), 'descricao': descricao, campo_valor: f'{valor:.2f}'.replace('.', ',')}
+    return {'local': local, 'data_compra': data_compra.isoformat(), 'descricao': descricao, 'tipo': tipo, 'valor_centavos': int(valor * 100)}
+
+def linhas_de_detalhe(user, ano, mes, metodos, formato='iso', agrupamento=None, **filtros):
+    """ Gera (chave, linha) dos gastos do mês em ordem de data da compra; à vista antes do crédito no mesmo dia.
+
+    `filtros` vale para Lancamento e Parcela (ex.: categoria=..., categoria__macro_categoria=...).
+    A chave é o nome da categoria ou da macro categoria, conforme `agrupamento` (ou None).
+    """
+    inicio, fim = intervalo_do_mes(ano, mes)
+    campo_chave = {'categoria': 'categoria__nome', 'macro_categoria': 'categoria__macro_categoria'}.get(agrupamento, 'categoria_id')
+    fontes = []
+    metodos_avista = [m for m in metodos if m != 'Crédito']
+    if metodos_avista:
+        avista = (Lancamento.objects
+            .filter(user=user, data_compra__gte=inicio, data_compra__lt=fim, metodo_pagamento__in=metodos_avista, **filtros)
+            .order_by('data_compra', 'pk')
+            .values_list('data_compra', 'local_compra', 'descricao', 'valor_total', campo_chave))
+        fontes.append(((data, 0, 'avista', local, descricao, valor, chave) for data, local, descricao, valor, chave in avista.iterator()))
+    if 'Crédito' in metodos:
+        parcelas = (Parcela.objects
+            .filter(user=user, cartao__isnull=False, data_vencimento__gte=inicio, data_vencimento__lt=fim, **filtros)
+            .order_by('lancamento__data_compra', 'lancamento_id')
+            .values_list('lancamento__data_compra', 'lancamento__local_compra', 'lancamento__descricao', 'valor', campo_chave))
+        fontes.append(((data, 1, 'parcela', local, descricao, valor, chave) for data, local, descricao, valor, chave in parcelas.iterator()))
+
+    for data, _, tipo, local, descricao, valor, chave in heapq.merge(*fontes, key=lambda item: item[:2]):
+        yield (chave if agrupamento else None), _linha(local, descricao, data, valor, tipo, formato)
+
+def detalhes_do_mes(user, ano, mes, metodos, agrupamento, formato='iso'):
+    """ {categoria (ou macro): [linhas]} de todas as categorias do mês, em uma consulta para à vista e outra para o crédito. """
+    detalhes = {}
+    for chave, linha in linhas_de_detalhe(user, ano, mes, metodos, formato, agrupamento):
+        detalhes.setdefault(chave, []).append(linha)
+    return detalhes
+
+async def adetalhes_do_mes(user, ano, mes, metodos, agrupamento, formato='iso'):
+    return await sync_to_async(detalhes_do_mes)(user, ano, mes, metodos, agrupamento, formato)
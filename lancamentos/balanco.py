@@ -0,0 +1,91 @@
+# Dentro de lancamentos/balanco.py
+import datetime
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from dateutil.relativedelta import relativedelta
+from django.db.models import Sum, Value, CharField, IntegerField, F
+from django.db.models.functions import TruncMonth
+from .models import Lancamento, Receita, Parcela
+
+# --- TOTAIS DO BALANÇO CALCULADOS NO BANCO ---
+# Receitas, gastos à vista e faturas de cartão agrupados por mês (e por cartão)
+# em uma única consulta (UNION ALL de três agregações), seja para um mês, para um
+# período do balanço ou para a projeção de fluxo de caixa. As views assíncronas usam
+# a mesma consulta via sync_to_async (o ORM assíncrono não roda consultas em paralelo).
+
+def _intervalo(inicio, fim):
+    return inicio.replace(day=1), fim.replace(day=1) + relativedelta(months=1)
+
+def _totais_agrupados(user, inicio, fim):
+    """ Linhas (tipo, mes, cartao_id, total) de todo o período, em uma única consulta. """
+    primeiro_dia, dia_seguinte_ao_fim = _intervalo(inicio, fim)
+    sem_cartao = Value(None, output_field=IntegerField())
+
+    receitas = (Receita.objects
+        .filter(user=user, data_recebimento__gte=primeiro_dia, data_recebimento__lt=dia_seguinte_ao_fim)
+        .annotate(tipo=Value('receitas', output_field=CharField()), mes=TruncMonth('data_recebimento'), id_cartao=sem_cartao)
+        .values('tipo', 'mes', 'id_cartao').annotate(total=Sum('valor')).order_by())
+    avista = (Lancamento.objects
+        .filter(user=user, data_compra__gte=primeiro_dia, data_compra__lt=dia_seguinte_ao_fim)
+        .exclude(metodo_pagamento='Crédito')
+        .annotate(tipo=Value('avista', output_field=CharField()), mes=TruncMonth('data_compra'), id_cartao=sem_cartao)
+        .values('tipo', 'mes', 'id_cartao').annotate(total=Sum('valor_total')).order_by())
+    faturas = (Parcela.objects
+        .filter(user=user, cartao__isnull=False, data_vencimento__gte=primeiro_dia, data_vencimento__lt=dia_seguinte_ao_fim)
+        .annotate(tipo=Value('fatura', output_field=CharField()), mes=TruncMonth('data_vencimento'), id_cartao=F('cartao_id'))
+        .values('tipo', 'mes', 'id_cartao').annotate(total=Sum('valor')).order_by())
+    return receitas.union(avista, faturas, all=True)
+
+def totais_por_mes(user, inicio, fim):
+    """ {(ano, mes): {'receitas', 'avista', 'fatura', 'faturas_por_cartao'}} de inicio até fim (datas, inclusive). """
+    primeiro_dia, dia_seguinte_ao_fim = _intervalo(inicio, fim)
+    totais = {}
+    mes = primeiro_dia
+    while mes < dia_seguinte_ao_fim:
+        totais[(mes.year, mes.month)] = {'receitas': Decimal('0.0'), 'avista': Decimal('0.0'), 'fatura': Decimal('0.0'), 'faturas_por_cartao': {}}
+        mes += relativedelta(months=1)
+
+    # Cada linha agregada é somada uma única vez no mês (e no cartão) a que pertence
+    for linha in _totais_agrupados(user, inicio, fim):
+        totais_do_mes = totais[(linha['mes'].year, linha['mes'].month)]
+        total = linha['total'] or Decimal('0.0')
+        totais_do_mes[linha['tipo']] += total
+        if linha['tipo'] == 'fatura':
+            por_cartao = totais_do_mes['faturas_por_cartao']
+            por_cartao[linha['id_cartao']] = por_cartao.get(linha['id_cartao'], Decimal('0.0')) + total
+    return totais
+
+def balanco_do_periodo(user, ano_final, mes_final, quantidade_meses):
+    """ Linhas do balanço dos últimos `quantidade_meses` meses até (ano_final, mes_final). """
+    fim = datetime.date(ano_final, mes_final, 1)
+    inicio = fim - relativedelta(months=quantidade_meses - 1)
+    linhas = []
+    for (ano, mes), totais in totais_por_mes(user, inicio, fim).items():
+        despesas = totais['avista'] + totais['fatura']
+        linhas.append({
+            'ano': ano, 'mes': mes,
+            'total_receitas': totais['receitas'],
+            'total_despesas_avista': totais['avista'],
+            'total_fatura_mes': totais['fatura'],
+            'total_despesas': despesas,
+            'saldo': totais['receitas'] - despesas,
+        })
+    return linhas
+
+async def abalanco_do_periodo(user, ano_final, mes_final, quantidade_meses):
+    return await sync_to_async(balanco_do_periodo)(user, ano_final, mes_final, quantidade_meses)
+
+def projecao(user, inicio, fim):
+    """ Fluxo de caixa mês a mês, com a fatura de cada cartão separada. """
+    meses = []
+    for (ano, mes), totais in totais_por_mes(user, inicio, fim).items():
+        total_faturas = totais['fatura']
+        meses.append({
+            'ano': ano, 'mes': mes,
+            'receitas': totais['receitas'],
+            'avista': totais['avista'],
+            'faturas_por_cartao': totais['faturas_por_cartao'],
+            'total_faturas': total_faturas,
+            'saldo': totais['receitas'] - totais['avista'] - total_faturas,
+        })
+    return meses
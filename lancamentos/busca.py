@@ -0,0 +1,33 @@
+# Dentro de lancamentos/busca.py
+import re
+from django.db import connection
+from .models import Lancamento
+
+# --- BUSCA TEXTUAL (SQLite FTS5) ---
+# local_compra e descricao de todos os lançamentos ficam na tabela virtual
+# lancamentos_busca (migração 0015), mantida por triggers. O tokenizador unicode61
+# com remove_diacritics ignora maiúsculas e acentos ("sao" acha "São"), e cada
+# palavra buscada vale como prefixo ("merc" acha "Mercado").
+LIMITE_DE_RESULTADOS = 100
+
+def consulta_fts(texto):
+    """ 'posto são' -> '"posto"* "são"*' (todas as palavras, cada uma como prefixo); '' se não houver palavras. """
+    return ' '.join(f'"{palavra}"*' for palavra in re.findall(r'\w+', texto or ''))
+
+def buscar(user, texto, limite=LIMITE_DE_RESULTADOS):
+    """ Lançamentos do usuário (todos os meses, cartões e métodos) que casam com o texto, dos mais relevantes aos menos.
+
+    A relevância é o bm25, com o local pesando o dobro da descrição; no empate vêm os mais recentes.
+    """
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT l.id FROM lancamentos_busca JOIN lancamentos_lancamento l ON l.id = lancamentos_busca.rowid '
+            'WHERE lancamentos_busca MATCH %s AND l.user_id = %s '
+            'ORDER BY bm25(lancamentos_busca, 2.0, 1.0), l.data_compra DESC, l.id DESC LIMIT %s',
+            [consulta, user.pk, limite])
+        ids = [linha[0] for linha in cursor.fetchall()]
+    por_id = Lancamento.objects.select_related('categoria', 'cartao').in_bulk(ids)
+    return [por_id[pk] for pk in ids]
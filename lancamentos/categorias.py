@@ -0,0 +1,59 @@
+# Dentro de lancamentos/categorias.py
+from django.db import transaction
+from .models import Categoria, CategoriaPadrao
+from .versao import marcar_alteracao
+
+# Quantos usuários são processados por vez (uma consulta de categorias por lote)
+TAMANHO_LOTE_USUARIOS = 500
+
+# --- PROVISIONAMENTO DAS CATEGORIAS PADRÃO ---
+# Compara as categorias padrão com as que cada usuário já tem (pelo nome) e grava as
+# diferenças com bulk_create / bulk_update: uma consulta e no máximo duas escritas
+# em lote por grupo de usuários, em vez de um exists() + create() por categoria.
+
+def _lotes(user_ids):
+    lote = []
+    for user_id in user_ids:
+        lote.append(user_id)
+        if len(lote) >= TAMANHO_LOTE_USUARIOS:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def provisionar_categorias(user_ids, criar=True, atualizar=False):
+    """ Cria as categorias padrão que faltam (criar) e/ou alinha macro_categoria e exemplos das existentes (atualizar).
+
+    Retorna {'criadas', 'atualizadas', 'usuarios'} — 'usuarios' são os ids que tiveram alguma alteração.
+    """
+    resultado = {'criadas': 0, 'atualizadas': 0, 'usuarios': set()}
+    padroes = list(CategoriaPadrao.objects.all())
+    if not padroes:
+        return resultado
+
+    for lote in _lotes(user_ids):
+        existentes = {user_id: {} for user_id in lote}
+        for categoria in Categoria.objects.filter(user_id__in=lote).only('pk', 'user_id', 'nome', 'macro_categoria', 'exemplos'):
+            existentes[categoria.user_id][categoria.nome] = categoria
+
+        novas, alteradas = [], []
+        for user_id, categorias in existentes.items():
+            for padrao in padroes:
+                categoria = categorias.get(padrao.nome)
+                if categoria is None:
+                    if criar:
+                        novas.append(Categoria(nome=padrao.nome, macro_categoria=padrao.macro_categoria, exemplos=padrao.exemplos, user_id=user_id))
+                        resultado['usuarios'].add(user_id)
+                elif atualizar and (categoria.macro_categoria, categoria.exemplos) != (padrao.macro_categoria, padrao.exemplos):
+                    categoria.macro_categoria, categoria.exemplos = padrao.macro_categoria, padrao.exemplos
+                    alteradas.append(categoria)
+                    resultado['usuarios'].add(user_id)
+
+        with transaction.atomic():
+            Categoria.objects.bulk_create(novas, batch_size=TAMANHO_LOTE_USUARIOS)
+            Categoria.objects.bulk_update(alteradas, ['macro_categoria', 'exemplos'], batch_size=TAMANHO_LOTE_USUARIOS)
+            # As operações em lote não disparam os sinais que invalidam os caches
+            marcar_alteracao(*{c.user_id for c in novas + alteradas})
+        resultado['criadas'] += len(novas)
+        resultado['atualizadas'] += len(alteradas)
+    return resultado
@@ -0,0 +1,88 @@
+# Dentro de lancamentos/exportacao.py
+import csv
+import datetime
+from .models import Lancamento, Parcela, Receita
+
+# Quantas linhas são lidas do banco por vez durante a exportação
+TAMANHO_LOTE_EXPORTACAO = 1000
+
+# --- EXPORTAÇÃO DE EXTRATO, FATURAS E RECEITAS ---
+# Cada exportação é um gerador: as linhas são lidas do banco com .iterator() e
+# escritas uma a uma, então um período de vários anos usa memória constante e os
+# primeiros bytes saem antes de a consulta terminar.
+# O CSV segue o padrão do Excel em português (';' e vírgula decimal).
+TIPOS = ('extrato', 'faturas', 'receitas')
+FORMATOS = ('csv', 'ofx')
+
+def _valor_br(valor):
+    return f'{valor:.2f}'.replace('.', ',')
+
+def _movimentos(tipo, user, inicio, fim, cartao_id=None):
+    """ Gera (id, data, nome, memo, valor, colunas_csv) do tipo pedido entre inicio e fim (inclusive). """
+    if tipo == 'extrato':
+        linhas = (Lancamento.objects
+            .filter(user=user, data_compra__gte=inicio, data_compra__lte=fim)
+            .order_by('data_compra', 'pk')
+            .values_list('pk', 'data_compra', 'local_compra', 'descricao', 'categoria__nome', 'metodo_pagamento', 'cartao__nome', 'num_parcelas', 'valor_total'))
+        for pk, data, local, descricao, categoria, metodo, cartao, num_parcelas, valor in linhas.iterator(chunk_size=TAMANHO_LOTE_EXPORTACAO):
+            yield f'L{pk}', data, local, descricao, -valor, [data.strftime('%d/%m/%Y'), local, descricao or '', categoria, metodo, cartao or '', num_parcelas, _valor_br(valor)]
+    elif tipo == 'faturas':
+        linhas = Parcela.objects.filter(user=user, cartao__isnull=False, data_vencimento__gte=inicio, data_vencimento__lte=fim)
+        if cartao_id:
+            linhas = linhas.filter(cartao_id=cartao_id)
+        linhas = (linhas
+            .order_by('data_vencimento', 'cartao_id', 'lancamento__data_compra', 'pk')
+            .values_list('pk', 'data_vencimento', 'cartao__nome', 'lancamento__data_compra', 'lancamento__local_compra', 'lancamento__descricao', 'categoria__nome', 'numero', 'lancamento__num_parcelas', 'valor'))
+        for pk, vencimento, cartao, data_compra, local, descricao, categoria, numero, num_parcelas, valor in linhas.iterator(chunk_size=TAMANHO_LOTE_EXPORTACAO):
+            yield f'P{pk}', vencimento, local, descricao, -valor, [vencimento.strftime('%d/%m/%Y'), cartao, data_compra.strftime('%d/%m/%Y'), local, descricao or '', categoria, f'{numero}/{num_parcelas or 1}', _valor_br(valor)]
+    else:
+        linhas = (Receita.objects
+            .filter(user=user, data_recebimento__gte=inicio, data_recebimento__lte=fim)
+            .order_by('data_recebimento', 'pk')
+            .values_list('pk', 'data_recebimento', 'descricao', 'valor'))
+        for pk, data, descricao, valor in linhas.iterator(chunk_size=TAMANHO_LOTE_EXPORTACAO):
+            yield f'R{pk}', data, descricao, '', valor, [data.strftime('%d/%m/%Y'), descricao, _valor_br(valor)]
+
+CABECALHOS_CSV = {
+    'extrato': ['Data', 'Local', 'Descrição', 'Categoria', 'Método', 'Cartão', 'Parcelas', 'Valor'],
+    'faturas': ['Vencimento', 'Cartão', 'Data da Compra', 'Local', 'Descrição', 'Categoria', 'Parcela', 'Valor'],
+    'receitas': ['Data', 'Descrição', 'Valor'],
+}
+
+class _Eco:
+    """ "Arquivo" que devolve o que recebe, para o csv.writer escrever direto na resposta. """
+    def write(self, valor):
+        return valor
+
+def gerar_csv(tipo, user, inicio, fim, cartao_id=None):
+    escritor = csv.writer(_Eco(), delimiter=';')
+    # BOM para o Excel reconhecer o UTF-8
+    yield '\ufeff' + escritor.writerow(CABECALHOS_CSV[tipo])
+    for *_, colunas in _movimentos(tipo, user, inicio, fim, cartao_id):
+        yield escritor.writerow(colunas)
+
+def _texto_ofx(texto):
+    return (texto or '').replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('\n', ' ')[:255]
+
+def gerar_ofx(tipo, user, inicio, fim, cartao_id=None):
+    """ OFX 1.02 (SGML): extrato e receitas como conta corrente, faturas como cartão de crédito. """
+    agora = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    cartao = tipo == 'faturas'
+    yield ('OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:UTF-8\nCHARSET:NONE\n'
+           'COMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n'
+           f'<OFX>\n<SIGNONMSGSRSV1><SONRS><STATUS><CODE>0<SEVERITY>INFO</STATUS><DTSERVER>{agora}<LANGUAGE>POR</SONRS></SIGNONMSGSRSV1>\n')
+    if cartao:
+        yield (f'<CREDITCARDMSGSRSV1><CCSTMTTRNRS><TRNUID>1<STATUS><CODE>0<SEVERITY>INFO</STATUS>\n'
+               f'<CCSTMTRS><CURDEF>BRL<CCACCTFROM><ACCTID>{cartao_id or "todos"}</CCACCTFROM>\n')
+    else:
+        yield (f'<BANKMSGSRSV1><STMTTRNRS><TRNUID>1<STATUS><CODE>0<SEVERITY>INFO</STATUS>\n'
+               f'<STMTRS><CURDEF>BRL<BANKACCTFROM><BANKID>0<ACCTID>{user.username}<ACCTTYPE>CHECKING</BANKACCTFROM>\n')
+    yield f'<BANKTRANLIST><DTSTART>{inicio:%Y%m%d}<DTEND>{fim:%Y%m%d}\n'
+    for fitid, data, nome, memo, valor, _ in _movimentos(tipo, user, inicio, fim, cartao_id):
+        yield (f'<STMTTRN><TRNTYPE>{"CREDIT" if valor >= 0 else "DEBIT"}<DTPOSTED>{data:%Y%m%d}'
+               f'<TRNAMT>{valor:.2f}<FITID>{fitid}<NAME>{_texto_ofx(nome)[:32]}<MEMO>{_texto_ofx(memo)}</STMTTRN>\n')
+    yield '</BANKTRANLIST>\n'
+    if cartao:
+        yield '</CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1>\n</OFX>\n'
+    else:
+        yield '</STMTRS></STMTTRNRS></BANKMSGSRSV1>\n</OFX>\n'
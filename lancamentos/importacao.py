@@ -0,0 +1,212 @@
+# Dentro de lancamentos/importacao.py
+import csv
+import datetime
+import re
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from .models import Lancamento, Categoria, CartaoDeCredito, Parcela
+from .parcelas import gerar_parcelas
+from .meses import registrar_meses
+from .versao import marcar_alteracao
+from .regras import classificador_do_usuario
+
+# Quantos lançamentos vão para o banco em cada bulk_create
+TAMANHO_LOTE_IMPORTACAO = 500
+
+# --- IMPORTAÇÃO DE EXTRATOS (CSV / OFX) ---
+# Os arquivos são lidos linha a linha (geradores) e gravados em lotes com
+# bulk_create dentro de uma única transação. Como o bulk_create não dispara os
+# sinais, as parcelas, o índice de meses e a versão dos dados são atualizados aqui.
+# Uma linha é considerada repetida quando já existe um lançamento do usuário com a
+# mesma data, local, valor e número de parcelas (no banco ou no próprio arquivo).
+FORMATOS = ('csv', 'ofx')
+METODOS = [metodo for metodo, _ in Lancamento.METODO_PAGAMENTO_CHOICES]
+
+class ErroDeImportacao(ValueError):
+    pass
+
+# Nomes de coluna aceitos no CSV (o mesmo layout da exportação do extrato funciona direto)
+COLUNAS_CSV = {
+    'data': 'data', 'data da compra': 'data',
+    'local': 'local', 'local da compra': 'local', 'estabelecimento': 'local',
+    'descrição': 'descricao', 'descricao': 'descricao',
+    'categoria': 'categoria',
+    'método': 'metodo', 'metodo': 'metodo',
+    'cartão': 'cartao', 'cartao': 'cartao',
+    'parcelas': 'parcelas',
+    'valor': 'valor',
+}
+
+def _ler_data(texto):
+    texto = texto.strip()
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%Y%m%d'):
+        try:
+            return datetime.datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ErroDeImportacao(f'data inválida: "{texto}"')
+
+def _ler_valor(texto):
+    texto = texto.strip().replace('R$', '').replace(' ', '')
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        valor = Decimal(texto)
+    except InvalidOperation:
+        raise ErroDeImportacao(f'valor inválido: "{texto}"')
+    # 'NaN' e 'Infinity' são Decimais válidos, mas quebram as contas das parcelas
+    if not valor.is_finite():
+        raise ErroDeImportacao(f'valor inválido: "{texto}"')
+    return valor
+
+def ler_csv(linhas):
+    """ Gera (numero_da_linha, dados) de um CSV com cabeçalho, separado por ';' ou ','. """
+    linhas = iter(linhas)
+    cabecalho = next(linhas, '')
+    delimitador = ';' if cabecalho.count(';') >= cabecalho.count(',') else ','
+    nomes = [COLUNAS_CSV.get(nome.strip().lower().lstrip('\ufeff')) for nome in next(csv.reader([cabecalho], delimiter=delimitador), [])]
+    if not {'data', 'local', 'valor'} <= set(nomes):
+        raise ErroDeImportacao('O CSV precisa das colunas Data, Local e Valor.')
+    for numero, colunas in enumerate(csv.reader(linhas, delimiter=delimitador), start=2):
+        if not any(coluna.strip() for coluna in colunas):
+            continue
+        yield numero, {nome: valor.strip() for nome, valor in zip(nomes, colunas) if nome}
+
+_TAG_OFX = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+def ler_ofx(linhas):
+    """ Gera (numero_da_transacao, dados) de cada <STMTTRN> de um OFX (SGML ou XML). """
+    transacao = None
+    numero = 0
+    for linha in linhas:
+        for tag, valor in _TAG_OFX.findall(linha.replace('</STMTTRN>', '<STMTTRN_FIM>')):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                transacao = {}
+            elif tag == 'STMTTRN_FIM' and transacao is not None:
+                numero += 1
+                yield numero, {
+                    'data': transacao.get('DTPOSTED', '')[:8],
+                    'local': transacao.get('NAME') or transacao.get('MEMO', ''),
+                    'descricao': transacao.get('MEMO', '') if transacao.get('NAME') else '',
+                    'valor': transacao.get('TRNAMT', ''),
+                    'ofx': True,
+                }
+                transacao = None
+            elif transacao is not None:
+                transacao[tag] = valor.strip()
+
+class _Mapeamento:
+    """ Resolve categoria, cartão e método de cada linha com poucas consultas (nomes em cache). """
+    def __init__(self, user, categoria_padrao=None, cartao_padrao=None, metodo_padrao='Crédito'):
+        self.categorias = {c.nome.lower(): c for c in Categoria.objects.filter(user=user)}
+        self.categorias_por_id = {c.pk: c for c in self.categorias.values()}
+        self.classificador = classificador_do_usuario(user.pk)
+        self.cartoes = {c.nome.lower(): c for c in CartaoDeCredito.objects.filter(user=user)}
+        self.categoria_padrao = categoria_padrao
+        self.cartao_padrao = cartao_padrao
+        self.metodo_padrao = metodo_padrao
+
+    def lancamento(self, user, dados):
+        data_compra = _ler_data(dados.get('data', ''))
+        local = dados.get('local', '')[:200]
+        if not local:
+            raise ErroDeImportacao('local em branco')
+        valor = _ler_valor(dados.get('valor', ''))
+        # No OFX os gastos vêm negativos; no CSV, positivos (como na exportação do extrato).
+        # O sinal contrário é crédito (pagamento, estorno) e não vira lançamento em nenhum dos dois.
+        if dados.get('ofx'):
+            valor = -valor
+        if valor <= 0:
+            return None
+        # Categoria do arquivo; senão a das regras de categorização; senão a padrão
+        categoria = self.categorias.get(dados.get('categoria', '').lower())
+        if categoria is None:
+            categoria = self.categorias_por_id.get(self.classificador.classificar(local, dados.get('descricao')), self.categoria_padrao)
+        if categoria is None:
+            raise ErroDeImportacao(f'categoria "{dados.get("categoria", "")}" não encontrada e nenhuma categoria padrão informada')
+        metodo = dados.get('metodo') or self.metodo_padrao
+        if metodo not in METODOS:
+            raise ErroDeImportacao(f'método de pagamento inválido: "{metodo}"')
+        cartao = None
+        if metodo == 'Crédito':
+            cartao = self.cartoes.get(dados.get('cartao', '').lower(), self.cartao_padrao)
+            if cartao is None:
+                raise ErroDeImportacao('compra no crédito sem cartão (informe um cartão padrão)')
+        try:
+            num_parcelas = int(dados.get('parcelas') or 1)
+        except ValueError:
+            raise ErroDeImportacao(f'número de parcelas inválido: "{dados.get("parcelas")}"')
+        if num_parcelas > Lancamento.MAX_PARCELAS:
+            raise ErroDeImportacao(f'número de parcelas acima de {Lancamento.MAX_PARCELAS}: "{dados.get("parcelas")}"')
+        return Lancamento(
+            local_compra=local, descricao=dados.get('descricao') or None, data_compra=data_compra,
+            valor_total=valor, metodo_pagamento=metodo, cartao=cartao, num_parcelas=max(num_parcelas, 1),
+            categoria=categoria, user=user,
+        )
+
+def _chave(lancamento):
+    return (lancamento.data_compra, lancamento.local_compra, Decimal(lancamento.valor_total).quantize(Decimal('0.01')), lancamento.num_parcelas)
+
+def _existentes(user, lote):
+    """ Chaves de deduplicação dos lançamentos já gravados no intervalo de datas do lote. """
+    datas = [l.data_compra for l in lote]
+    locais = {l.local_compra for l in lote}
+    return set(
+        Lancamento.objects
+        .filter(user=user, data_compra__gte=min(datas), data_compra__lte=max(datas), local_compra__in=locais)
+        .values_list('data_compra', 'local_compra', 'valor_total', 'num_parcelas')
+    )
+
+def _gravar_lote(user, lote, vistos, resultado):
+    existentes = _existentes(user, lote)
+    novos = []
+    for lancamento in lote:
+        chave = _chave(lancamento)
+        if chave in existentes or chave in vistos:
+            resultado['duplicados'] += 1
+            continue
+        vistos.add(chave)
+        novos.append(lancamento)
+    if not novos:
+        return
+    Lancamento.objects.bulk_create(novos)
+    parcelas = gerar_parcelas(novos)
+    Parcela.objects.bulk_create(parcelas, batch_size=TAMANHO_LOTE_IMPORTACAO)
+    meses = {(p.data_vencimento.year, p.data_vencimento.month) for p in parcelas}
+    meses.update((l.data_compra.year, l.data_compra.month) for l in novos if l.metodo_pagamento != 'Crédito')
+    registrar_meses(user.pk, meses)
+    resultado['importados'] += len(novos)
+
+def importar(user, linhas, formato='csv', categoria_padrao=None, cartao_padrao=None, metodo_padrao='Crédito'):
+    """ Importa as linhas (texto) de um extrato. Retorna {'importados', 'duplicados', 'ignorados', 'erros'}.
+
+    Linhas com erro são listadas em 'erros' como (linha, mensagem) e não impedem as demais.
+    Erros no arquivo como um todo (ex.: cabeçalho sem as colunas obrigatórias) levantam ErroDeImportacao.
+    """
+    if formato not in FORMATOS:
+        raise ErroDeImportacao(f'Formato inválido. Use: {", ".join(FORMATOS)}.')
+    leitor = ler_csv(linhas) if formato == 'csv' else ler_ofx(linhas)
+    mapeamento = _Mapeamento(user, categoria_padrao, cartao_padrao, metodo_padrao)
+    resultado = {'importados': 0, 'duplicados': 0, 'ignorados': 0, 'erros': []}
+    vistos = set()
+    lote = []
+    with transaction.atomic():
+        for numero, dados in leitor:
+            try:
+                lancamento = mapeamento.lancamento(user, dados)
+            except ErroDeImportacao as erro:
+                resultado['erros'].append((numero, str(erro)))
+                continue
+            if lancamento is None:
+                resultado['ignorados'] += 1
+                continue
+            lote.append(lancamento)
+            if len(lote) >= TAMANHO_LOTE_IMPORTACAO:
+                _gravar_lote(user, lote, vistos, resultado)
+                lote = []
+        if lote:
+            _gravar_lote(user, lote, vistos, resultado)
+        if resultado['importados']:
+            marcar_alteracao(user.pk)
+    return resultado
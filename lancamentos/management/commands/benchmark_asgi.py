@@ -0,0 +1,131 @@
+# Dentro de lancamentos/management/commands/benchmark_asgi.py
+import datetime
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+from lancamentos.sinteticos import banco_temporario, gerar_usuario
+
+# O mesmo projeto com um único worker: síncrono (WSGI, uma requisição por vez, como um worker
+# "sync" do gunicorn) e assíncrono (uvicorn com o config/asgi.py). O adaptador WSGI do próprio
+# uvicorn não serve de base: ele recusa o Set-Cookie do CSRF que o Django envia.
+INTERFACES = {
+    'wsgi': [sys.executable, 'manage.py', 'runserver', '--noreload', '--nothreading', '--skip-checks'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'config.asgi:application', '--workers', '1', '--log-level', 'warning', '--port'],
+}
+
+
+class Command(BaseCommand):
+    help = ('Sobe o projeto com 1 worker WSGI e depois com o uvicorn (ASGI, 1 worker) sobre um banco temporário e '
+            'dispara requisições concorrentes aos dashboards, ao balanço e às APIs de detalhe. Mostra vazão e latência p50/p95.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compras', type=int, default=10000, help='Compras do usuário de teste.')
+        parser.add_argument('--concorrencia', type=int, default=32, help='Requisições simultâneas.')
+        parser.add_argument('--segundos', type=float, default=10)
+        parser.add_argument('--porta', type=int, default=8765)
+        parser.add_argument('--interfaces', nargs='+', choices=list(INTERFACES), default=list(INTERFACES))
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn  # noqa: F401
+        except ImportError:
+            raise CommandError('Instale o uvicorn (pip install uvicorn) para rodar este benchmark.')
+
+        with banco_temporario() as caminho_do_banco:
+            user = gerar_usuario('benchmark-asgi', options['compras'], anos=3)
+            cookie = f'{settings.SESSION_COOKIE_NAME}={self.criar_sessao(user)}'
+            caminhos = self.caminhos()
+            connections.close_all()
+            self.stdout.write(f"{'interface':>9} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'erros':>6}")
+            for interface in options['interfaces']:
+                self.stdout.write(self.medir(interface, caminho_do_banco, cookie, caminhos, options))
+
+    def criar_sessao(self, user):
+        sessao = SessionStore()
+        sessao[SESSION_KEY] = str(user.pk)
+        sessao[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        sessao[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        sessao.create()
+        return sessao.session_key
+
+    def caminhos(self):
+        hoje = datetime.date.today()
+        mes = f'ano={hoje.year}&mes={hoje.month}'
+        return [
+            f"{reverse('dashboard')}?{mes}",
+            f"{reverse('dashboard_macro')}?{mes}",
+            f"{reverse('balanco_mensal')}?{mes}&periodo=12",
+            f"{reverse('api_detalhes_mes')}?{mes}",
+            f"{reverse('api_detalhes_macro_categoria')}?{mes}&macro_categoria=Essenciais",
+        ]
+
+    def esperar_servidor(self, porta, processo, limite=30):
+        fim = time.perf_counter() + limite
+        while time.perf_counter() < fim:
+            if processo.poll() is not None:
+                raise CommandError('O uvicorn terminou antes de aceitar conexões.')
+            try:
+                with socket.create_connection(('127.0.0.1', porta), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'O uvicorn não respondeu na porta {porta}.')
+
+    def medir(self, interface, caminho_do_banco, cookie, caminhos, options):
+        porta = options['porta']
+        ambiente = dict(os.environ, MEU_FINANCEIRO_DB=caminho_do_banco, DJANGO_SETTINGS_MODULE='config.settings')
+        comando = INTERFACES[interface] + ([str(porta)] if interface == 'asgi' else [f'127.0.0.1:{porta}'])
+        processo = subprocess.Popen(comando, cwd=settings.BASE_DIR, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            self.esperar_servidor(porta, processo)
+            tempos, erros = self.disparar(f'http://127.0.0.1:{porta}', cookie, caminhos, options)
+        finally:
+            processo.terminate()
+            processo.wait(timeout=30)
+        tempos.sort()
+        p50 = statistics.median(tempos) * 1000 if tempos else 0
+        p95 = tempos[min(int(len(tempos) * 0.95), len(tempos) - 1)] * 1000 if tempos else 0
+        return f"{interface:>9} {len(tempos) / options['segundos']:>8.1f} {p50:>9.1f} {p95:>9.1f} {erros:>6}"
+
+    def disparar(self, base, cookie, caminhos, options):
+        fim = time.perf_counter() + options['segundos']
+        trava = threading.Lock()
+        tempos, erros = [], [0]
+        contador = iter(range(10 ** 9))
+
+        def trabalhar():
+            meus_tempos, meus_erros = [], 0
+            while time.perf_counter() < fim:
+                with trava:
+                    n = next(contador)
+                # O parâmetro extra evita o cache de páginas: toda requisição faz as consultas
+                pedido = urllib.request.Request(f'{base}{caminhos[n % len(caminhos)]}&_={n}', headers={'Cookie': cookie})
+                inicio = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(pedido, timeout=60) as resposta:
+                        resposta.read()
+                    meus_tempos.append(time.perf_counter() - inicio)
+                except (urllib.error.URLError, OSError):
+                    meus_erros += 1
+            with trava:
+                tempos.extend(meus_tempos)
+                erros[0] += meus_erros
+
+        threads = [threading.Thread(target=trabalhar) for _ in range(options['concorrencia'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return tempos, erros[0]
@@ -0,0 +1,27 @@
+# Dentro de lancamentos/management/commands/benchmark_classificador.py
+import time
+from django.core.management.base import BaseCommand
+from lancamentos.regras import Classificador
+
+
+class Command(BaseCommand):
+    help = ('Mede quanto tempo o classificador de regras leva para categorizar compras, '
+            'com quantidades diferentes de regras. Não toca no banco.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regras', type=int, nargs='+', default=[10, 100, 1000], help='Quantidades de regras a testar.')
+        parser.add_argument('--textos', type=int, default=20000, help='Compras classificadas em cada medição.')
+
+    def handle(self, *args, **options):
+        textos = [(f'Loja {i}', 'compra no posto shell' if i % 2 else None) for i in range(options['textos'])]
+        self.stdout.write(f"{'regras':>7} {'textos':>8} {'ms (compilar)':>14} {'ms (classificar)':>17} {'µs/texto':>9}")
+        for quantidade in options['regras']:
+            regras = [(f'estabelecimento {i}', i, 0) for i in range(quantidade - 1)] + [('posto shell', quantidade, 0)]
+            inicio = time.perf_counter()
+            classificador = Classificador(regras)
+            ms_compilar = (time.perf_counter() - inicio) * 1000
+            inicio = time.perf_counter()
+            for local, descricao in textos:
+                classificador.classificar(local, descricao)
+            ms_classificar = (time.perf_counter() - inicio) * 1000
+            self.stdout.write(f'{quantidade:>7} {len(textos):>8} {ms_compilar:>14.1f} {ms_classificar:>17.1f} {ms_classificar * 1000 / len(textos):>9.2f}')
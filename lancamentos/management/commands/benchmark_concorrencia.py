@@ -0,0 +1,111 @@
+# Dentro de lancamentos/management/commands/benchmark_concorrencia.py
+import datetime
+import threading
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections, transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from lancamentos.models import Categoria, CartaoDeCredito, Lancamento
+from lancamentos.sinteticos import banco_temporario
+
+# "antes" é a configuração crua do SQLite; "depois" é a de config/settings.py
+PERFIS = {
+    'antes': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}},
+    'depois': {
+        'CONN_MAX_AGE': settings.DATABASES['default'].get('CONN_MAX_AGE', 0),
+        'CONN_HEALTH_CHECKS': settings.DATABASES['default'].get('CONN_HEALTH_CHECKS', False),
+        'OPTIONS': settings.DATABASES['default'].get('OPTIONS', {}),
+    },
+}
+
+
+class Command(BaseCommand):
+    help = ('Lê a fatura (lista_lancamentos) em várias threads enquanto outras gravam lançamentos pela view '
+            'novo_lancamento, com o SQLite cru e com o perfil de produção. Usa um banco temporário.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--leitores', type=int, default=8)
+        parser.add_argument('--escritores', type=int, default=2)
+        parser.add_argument('--segundos', type=float, default=10)
+        parser.add_argument('--lancamentos', type=int, default=300, help='Compras criadas antes de medir.')
+        parser.add_argument('--perfis', nargs='+', choices=list(PERFIS), default=list(PERFIS))
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            self.stdout.write(f"{'perfil':>7} {'leituras/s':>11} {'escritas/s':>11} {'p95 leitura (ms)':>17} {'locked':>7} {'outros erros':>13}")
+            for perfil in options['perfis']:
+                with banco_temporario(**PERFIS[perfil]):
+                    user, categoria, cartao = self.preparar(options['lancamentos'])
+                    self.stdout.write(self.medir(perfil, user, categoria, cartao, options))
+        finally:
+            teardown_test_environment()
+
+    def preparar(self, quantidade):
+        user = User.objects.create_user(username='benchmark', password='benchmark')
+        categoria = Categoria.objects.create(nome='Benchmark', user=user)
+        cartao = CartaoDeCredito.objects.create(user=user, nome='Benchmark', limite=Decimal('10000'), dia_fechamento=3, dia_vencimento=10)
+        hoje = datetime.date.today()
+        with transaction.atomic():
+            for i in range(quantidade):
+                Lancamento.objects.create(
+                    local_compra=f'Loja {i}', data_compra=hoje - datetime.timedelta(days=i % 60), valor_total=Decimal('120.00'),
+                    metodo_pagamento='Crédito', cartao=cartao, num_parcelas=1 + i % 6, categoria=categoria, user=user,
+                )
+        return user, categoria, cartao
+
+    def medir(self, perfil, user, categoria, cartao, options):
+        fim = time.perf_counter() + options['segundos']
+        trava = threading.Lock()
+        resultado = {'leituras': 0, 'escritas': 0, 'locked': 0, 'outros': 0, 'tempos': []}
+        hoje = datetime.date.today()
+
+        def trabalhar(escritor):
+            cliente = Client()
+            cliente.force_login(user)
+            leituras, escritas, locked, outros, tempos = 0, 0, 0, 0, []
+            try:
+                while time.perf_counter() < fim:
+                    inicio = time.perf_counter()
+                    try:
+                        if escritor:
+                            cliente.post(reverse('novo_lancamento'), {
+                                'local': 'Concorrência', 'data': hoje.isoformat(), 'valor': '10.00', 'parcelas': '3',
+                                'categoria': categoria.pk, 'metodo_pagamento': 'Crédito', 'cartao_id': cartao.pk,
+                            })
+                            escritas += 1
+                        else:
+                            cliente.get(reverse('fatura_cartao'), {'cartao_id': cartao.pk})
+                            leituras += 1
+                            tempos.append(time.perf_counter() - inicio)
+                    except OperationalError as erro:
+                        if 'locked' in str(erro):
+                            locked += 1
+                        else:
+                            outros += 1
+            finally:
+                connections.close_all()
+            with trava:
+                resultado['leituras'] += leituras
+                resultado['escritas'] += escritas
+                resultado['locked'] += locked
+                resultado['outros'] += outros
+                resultado['tempos'].extend(tempos)
+
+        threads = [threading.Thread(target=trabalhar, args=(False,)) for _ in range(options['leitores'])]
+        threads += [threading.Thread(target=trabalhar, args=(True,)) for _ in range(options['escritores'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        tempos = sorted(resultado['tempos'])
+        p95 = tempos[int(len(tempos) * 0.95)] * 1000 if tempos else 0
+        segundos = options['segundos']
+        return (f"{perfil:>7} {resultado['leituras'] / segundos:>11.1f} {resultado['escritas'] / segundos:>11.1f} "
+                f"{p95:>17.1f} {resultado['locked']:>7} {resultado['outros']:>13}")
@@ -0,0 +1,54 @@
+# Dentro de lancamentos/management/commands/benchmark_janela_credito.py
+import datetime
+import random
+import time
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import transaction
+from lancamentos.models import Categoria, CartaoDeCredito, Lancamento
+
+
+class Command(BaseCommand):
+    help = ('Mede quantas compras de crédito são lidas para montar um mês: histórico inteiro '
+            'contra a janela de com_vencimento_no_mes. Os dados são criados e descartados numa transação.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anos', type=int, nargs='+', default=[1, 2, 5, 10], help='Tamanhos de histórico a testar.')
+        parser.add_argument('--compras-por-mes', type=int, default=40)
+        parser.add_argument('--max-parcelas', type=int, default=12)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'anos':>5} {'compras':>9} {'lidas (tudo)':>13} {'lidas (janela)':>15} {'ms (tudo)':>10} {'ms (janela)':>12}")
+        for anos in options['anos']:
+            with transaction.atomic():
+                self.stdout.write(self.medir(anos, options['compras_por_mes'], options['max_parcelas']))
+                transaction.set_rollback(True)
+
+    def medir(self, anos, compras_por_mes, max_parcelas):
+        aleatorio = random.Random(anos)
+        user = User.objects.create(username=f'benchmark-janela-{anos}')
+        categoria = Categoria.objects.create(nome='Benchmark', user=user)
+        cartao = CartaoDeCredito.objects.create(user=user, nome='Benchmark', limite=Decimal('10000'), dia_fechamento=3, dia_vencimento=10)
+
+        hoje = datetime.date.today().replace(day=1)
+        compras = []
+        for meses_atras in range(anos * 12):
+            mes = hoje - relativedelta(months=meses_atras)
+            for _ in range(compras_por_mes):
+                compras.append(Lancamento(
+                    local_compra='Loja', data_compra=mes.replace(day=aleatorio.randint(1, 28)), valor_total=Decimal('100.00'),
+                    metodo_pagamento='Crédito', cartao=cartao, num_parcelas=aleatorio.randint(1, max_parcelas),
+                    categoria=categoria, user=user,
+                ))
+        # bulk_create não dispara os sinais: só as linhas de Lancamento importam aqui
+        Lancamento.objects.bulk_create(compras, batch_size=1000)
+
+        inicio = time.perf_counter()
+        lidas_tudo = len(list(Lancamento.objects.filter(user=user, metodo_pagamento='Crédito')))
+        ms_tudo = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        lidas_janela = len(list(Lancamento.objects.filter(user=user).com_vencimento_no_mes(hoje.year, hoje.month)))
+        ms_janela = (time.perf_counter() - inicio) * 1000
+        return f'{anos:>5} {len(compras):>9} {lidas_tudo:>13} {lidas_janela:>15} {ms_tudo:>10.1f} {ms_janela:>12.1f}'
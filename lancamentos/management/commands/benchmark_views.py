@@ -0,0 +1,113 @@
+# Dentro de lancamentos/management/commands/benchmark_views.py
+import datetime
+import json
+import statistics
+import subprocess
+import time
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from lancamentos import urls
+from lancamentos.models import Categoria, CartaoDeCredito, Lancamento, Receita
+from lancamentos.sinteticos import banco_temporario, gerar_usuario
+
+
+class Command(BaseCommand):
+    help = ('Mede cada URL de lancamentos/urls.py (GET, cache vazio) para usuários com 1k/10k/100k compras: '
+            'consultas e latência p50/p95, gravadas em JSON para comparar commits. Usa um banco temporário.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 10000, 100000], help='Compras por usuário.')
+        parser.add_argument('--anos', type=int, default=5)
+        parser.add_argument('--repeticoes', type=int, default=7)
+        parser.add_argument('--urls', nargs='+', help='Só estas URLs (nomes).')
+        parser.add_argument('--saida', default='benchmark_views.json')
+
+    def handle(self, *args, **options):
+        resultado = {'commit': self.commit_atual(), 'data': datetime.datetime.now().isoformat(timespec='seconds'), 'tamanhos': {}}
+        setup_test_environment()
+        try:
+            for tamanho in options['tamanhos']:
+                with banco_temporario():
+                    inicio = time.perf_counter()
+                    user = gerar_usuario(f'benchmark-{tamanho}', tamanho, options['anos'])
+                    user.is_staff = True
+                    user.save(update_fields=['is_staff'])
+                    self.stdout.write(f'\n{tamanho} compras (dados gerados em {time.perf_counter() - inicio:.1f} s)')
+                    self.stdout.write(f"{'url':<32} {'status':>6} {'consultas':>9} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+                    resultado['tamanhos'][tamanho] = medidas = {}
+                    for nome, caminho in self.requisicoes(user, options['urls']):
+                        medidas[nome] = self.medir(user, caminho, options['repeticoes'])
+                        m = medidas[nome]
+                        self.stdout.write(f"{nome:<32} {m['status']:>6} {m['consultas']:>9} {m['p50_ms']:>9.1f} {m['p95_ms']:>9.1f}")
+        finally:
+            teardown_test_environment()
+        with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"\nResultados gravados em {options['saida']}"))
+
+    def commit_atual(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def requisicoes(self, user, apenas=None):
+        """ (nome, caminho) de cada URL do app, com os argumentos e parâmetros que ela precisa. """
+        hoje = datetime.date.today()
+        lancamento = Lancamento.objects.filter(user=user).order_by('-data_compra').first()
+        receita = Receita.objects.filter(user=user).order_by('-data_recebimento').first()
+        cartao = CartaoDeCredito.objects.filter(user=user).first()
+        categoria = Categoria.objects.filter(user=user).first()
+        mes = f'ano={hoje.year}&mes={hoje.month}'
+        argumentos = {
+            'editar_lancamento': {'pk': lancamento.pk}, 'deletar_lancamento': {'pk': lancamento.pk},
+            'editar_receita': {'pk': receita.pk}, 'deletar_receita': {'pk': receita.pk},
+            'editar_cartao': {'pk': cartao.pk}, 'deletar_cartao': {'pk': cartao.pk},
+            'exportar': {'tipo': 'extrato'},
+        }
+        parametros = {
+            'api_detalhes_categoria': f'{mes}&categoria={categoria.nome}',
+            'api_detalhes_macro_categoria': f'{mes}&macro_categoria={categoria.macro_categoria}',
+            'api_detalhes_mes': mes,
+            'api_sugerir_categoria': 'local=Posto Shell',
+            'busca': 'q=posto',
+            'exportar': f'inicio={hoje.year - 1}-{hoje.month:02d}&fim={hoje:%Y-%m}',
+        }
+        for padrao in urls.urlpatterns:
+            if apenas and padrao.name not in apenas:
+                continue
+            caminho = reverse(padrao.name, kwargs=argumentos.get(padrao.name))
+            yield padrao.name, f'{caminho}?{parametros[padrao.name]}' if padrao.name in parametros else caminho
+
+    def consumir(self, resposta):
+        if resposta.is_async:
+            async def consumir():
+                async for _ in resposta.streaming_content:
+                    pass
+            async_to_sync(consumir)()
+        else:
+            for _ in resposta.streaming_content:
+                pass
+
+    def medir(self, user, caminho, repeticoes):
+        cliente = Client()
+        cliente.force_login(user)
+        tempos = []
+        for _ in range(repeticoes):
+            cache.clear()
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                resposta = cliente.get(caminho)
+                if resposta.streaming:
+                    self.consumir(resposta)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+        tempos.sort()
+        return {
+            'status': resposta.status_code, 'consultas': len(consultas),
+            'p50_ms': round(statistics.median(tempos), 2), 'p95_ms': round(tempos[min(int(len(tempos) * 0.95), len(tempos) - 1)], 2),
+        }
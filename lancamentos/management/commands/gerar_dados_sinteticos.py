@@ -0,0 +1,29 @@
+# Dentro de lancamentos/management/commands/gerar_dados_sinteticos.py
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from lancamentos.sinteticos import gerar_usuario
+
+
+class Command(BaseCommand):
+    help = 'Cria usuários com anos de lançamentos (vários métodos, parcelas de 1 a 24x em vários cartões), receitas e categorias.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=1)
+        parser.add_argument('--compras', type=int, default=5000, help='Compras por usuário.')
+        parser.add_argument('--anos', type=int, default=3)
+        parser.add_argument('--cartoes', type=int, default=3)
+        parser.add_argument('--prefixo', default='sintetico', help='Os usuários se chamam <prefixo>-1, <prefixo>-2...')
+        parser.add_argument('--senha', default='sintetico-123', help='Senha dos usuários criados.')
+        parser.add_argument('--semente', type=int, default=0)
+
+    def handle(self, *args, **options):
+        nomes = [f"{options['prefixo']}-{i}" for i in range(1, options['usuarios'] + 1)]
+        existentes = list(User.objects.filter(username__in=nomes).values_list('username', flat=True))
+        if existentes:
+            raise CommandError(f'Já existem usuários com esses nomes: {", ".join(existentes)}. Use outro --prefixo.')
+        for i, nome in enumerate(nomes):
+            inicio = time.perf_counter()
+            gerar_usuario(nome, options['compras'], options['anos'], options['cartoes'], options['semente'] + i, options['senha'])
+            self.stdout.write(f"{nome}: {options['compras']} compras em {time.perf_counter() - inicio:.1f} s")
+        self.stdout.write(self.style.SUCCESS(f'{len(nomes)} usuário(s) criado(s).'))
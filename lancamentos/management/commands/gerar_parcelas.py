@@ -0,0 +1,36 @@
+# Dentro de lancamentos/management/commands/gerar_parcelas.py
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from lancamentos.models import Lancamento, Parcela
+from lancamentos.parcelas import reconstruir_parcelas
+from lancamentos.meses import reconstruir_meses
+
+
+class Command(BaseCommand):
+    help = 'Gera (ou regera) a tabela de parcelas a partir dos lançamentos de crédito existentes e atualiza o índice de meses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help='Processa apenas os lançamentos deste usuário (username).')
+
+    def handle(self, *args, **options):
+        lancamentos = Lancamento.objects.filter(metodo_pagamento='Crédito')
+        parcelas_orfas = Parcela.objects.exclude(lancamento__metodo_pagamento='Crédito')
+        if options['usuario']:
+            try:
+                user = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+            lancamentos = lancamentos.filter(user=user)
+            parcelas_orfas = parcelas_orfas.filter(lancamento__user=user)
+
+        # Parcelas de lançamentos que deixaram de ser crédito por fora dos sinais (ex.: queryset.update)
+        parcelas_orfas.delete()
+
+        total_lancamentos = lancamentos.count()
+        total_parcelas = reconstruir_parcelas(lancamentos)
+
+        # As parcelas mudam os meses com dados, então o índice de meses é refeito junto
+        usuarios = User.objects.filter(username=options['usuario']) if options['usuario'] else User.objects.all()
+        for user_id in usuarios.values_list('pk', flat=True):
+            reconstruir_meses(user_id)
+        self.stdout.write(self.style.SUCCESS(f'{total_parcelas} parcela(s) gerada(s) para {total_lancamentos} lançamento(s) de crédito.'))
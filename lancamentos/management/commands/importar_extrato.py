@@ -0,0 +1,48 @@
+# Dentro de lancamentos/management/commands/importar_extrato.py
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from lancamentos.models import Categoria, CartaoDeCredito, Lancamento
+from lancamentos.importacao import importar, ErroDeImportacao
+
+
+class Command(BaseCommand):
+    help = 'Importa um extrato CSV ou OFX para os lançamentos de um usuário (mesmas regras da tela de importação).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo')
+        parser.add_argument('--usuario', required=True, help='Dono dos lançamentos (username).')
+        parser.add_argument('--formato', choices=['csv', 'ofx'], help='Padrão: pela extensão do arquivo.')
+        parser.add_argument('--categoria', help='Categoria padrão (nome).')
+        parser.add_argument('--cartao', help='Cartão padrão para compras no crédito (nome).')
+        parser.add_argument('--metodo', default='Crédito', choices=[m for m, _ in Lancamento.METODO_PAGAMENTO_CHOICES])
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+        categoria = cartao = None
+        if options['categoria']:
+            categoria = Categoria.objects.filter(user=user, nome__iexact=options['categoria']).first()
+            if categoria is None:
+                raise CommandError(f'Categoria "{options["categoria"]}" não encontrada para {user.username}.')
+        if options['cartao']:
+            cartao = CartaoDeCredito.objects.filter(user=user, nome__iexact=options['cartao']).first()
+            if cartao is None:
+                raise CommandError(f'Cartão "{options["cartao"]}" não encontrado para {user.username}.')
+        formato = options['formato'] or ('ofx' if options['arquivo'].lower().endswith('.ofx') else 'csv')
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['arquivo'], encoding='utf-8-sig', errors='replace', newline='') as arquivo:
+                resultado = importar(user, arquivo, formato, categoria, cartao, options['metodo'])
+        except (OSError, ErroDeImportacao) as erro:
+            raise CommandError(str(erro))
+
+        for numero, mensagem in resultado['erros']:
+            self.stderr.write(f'linha {numero}: {mensagem}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['importados']} importado(s), {resultado['duplicados']} repetido(s), {resultado['ignorados']} ignorado(s), "
+            f"{len(resultado['erros'])} com erro em {time.perf_counter() - inicio:.1f}s."
+        ))
@@ -0,0 +1,29 @@
+# Dentro de lancamentos/management/commands/provisionar_categorias.py
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from lancamentos.categorias import provisionar_categorias
+
+
+class Command(BaseCommand):
+    help = 'Cria as categorias padrão que faltam para os usuários (e, com --atualizar, alinha as existentes).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help='Processa apenas este usuário (username).')
+        parser.add_argument('--atualizar', action='store_true', help='Também atualiza macro categoria e exemplos das categorias existentes.')
+        parser.add_argument('--sem-criar', action='store_true', help='Não cria categorias novas (use com --atualizar).')
+
+    def handle(self, *args, **options):
+        usuarios = User.objects.all()
+        if options['usuario']:
+            usuarios = usuarios.filter(username=options['usuario'])
+            if not usuarios.exists():
+                raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+
+        resultado = provisionar_categorias(
+            usuarios.order_by('pk').values_list('pk', flat=True).iterator(),
+            criar=not options['sem_criar'], atualizar=options['atualizar'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['criadas']} categoria(s) criada(s) e {resultado['atualizadas']} atualizada(s) "
+            f"em {len(resultado['usuarios'])} usuário(s)."
+        ))
@@ -0,0 +1,29 @@
+# Dentro de lancamentos/management/commands/recategorizar.py
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from lancamentos.regras import recategorizar, semear_regras
+
+
+class Command(BaseCommand):
+    help = 'Reaplica as regras de categoria aos lançamentos existentes (só muda os que casam com alguma regra).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help='Processa apenas este usuário (username).')
+        parser.add_argument('--semear', action='store_true', help='Antes, cria regras com os exemplos das categorias.')
+
+    def handle(self, *args, **options):
+        usuarios = User.objects.all()
+        if options['usuario']:
+            usuarios = usuarios.filter(username=options['usuario'])
+            if not usuarios.exists():
+                raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+
+        for user in usuarios:
+            if options['semear']:
+                self.stdout.write(f'{user.username}: {semear_regras(user)} regra(s) criada(s).')
+            inicio = time.perf_counter()
+            analisados, alterados = recategorizar(user)
+            self.stdout.write(self.style.SUCCESS(
+                f'{user.username}: {alterados} de {analisados} lançamento(s) recategorizado(s) em {time.perf_counter() - inicio:.1f}s.'
+            ))
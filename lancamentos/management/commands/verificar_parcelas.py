@@ -0,0 +1,59 @@
+# Dentro de lancamentos/management/commands/verificar_parcelas.py
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from lancamentos.models import Lancamento, Parcela
+from lancamentos.parcelas import gerar_parcelas, reconstruir_parcelas
+from lancamentos.meses import intervalo_do_mes, reconstruir_meses
+from lancamentos.versao import marcar_alteracao
+
+
+class Command(BaseCommand):
+    help = 'Confere as parcelas materializadas de um mês contra o cronograma recalculado das compras.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int)
+        parser.add_argument('mes', type=int)
+        parser.add_argument('--usuario', help='Confere apenas este usuário (username).')
+        parser.add_argument('--corrigir', action='store_true', help='Regera as parcelas dos lançamentos divergentes.')
+
+    def handle(self, *args, **options):
+        ano, mes = options['ano'], options['mes']
+        lancamentos = Lancamento.objects.all()
+        inicio, fim = intervalo_do_mes(ano, mes)
+        parcelas = Parcela.objects.filter(data_vencimento__gte=inicio, data_vencimento__lt=fim)
+        if options['usuario']:
+            try:
+                user = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+            lancamentos = lancamentos.filter(user=user)
+            parcelas = parcelas.filter(user=user)
+
+        # Só as compras cuja janela de parcelas alcança o mês são recalculadas
+        candidatos = list(lancamentos.com_vencimento_no_mes(ano, mes).select_related('cartao'))
+        esperadas = {
+            (p.lancamento_id, p.numero, p.data_vencimento, p.valor, p.cartao_id, p.categoria_id)
+            for p in gerar_parcelas(candidatos)
+            if p.data_vencimento.year == ano and p.data_vencimento.month == mes
+        }
+        gravadas = set(parcelas.values_list('lancamento_id', 'numero', 'data_vencimento', 'valor', 'cartao_id', 'categoria_id'))
+
+        divergentes = {item[0] for item in esperadas ^ gravadas}
+        self.stdout.write(f'{len(candidatos)} compra(s) na janela do mês {mes:02d}/{ano}; {len(gravadas)} parcela(s) gravada(s).')
+        if not divergentes:
+            self.stdout.write(self.style.SUCCESS('Nenhuma divergência encontrada.'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'{len(divergentes)} lançamento(s) com parcelas divergentes: {sorted(divergentes)}'))
+        if options['corrigir']:
+            # Os donos antes da correção também: a parcela divergente pode estar com o usuário antigo
+            usuarios = set(Lancamento.objects.filter(pk__in=divergentes).values_list('user_id', flat=True))
+            usuarios.update(Parcela.objects.filter(lancamento_id__in=divergentes).values_list('user_id', flat=True))
+            reconstruir_parcelas(Lancamento.objects.filter(pk__in=divergentes))
+            # Parcelas de lançamentos que não existem mais como crédito
+            Parcela.objects.filter(lancamento_id__in=divergentes).exclude(lancamento__metodo_pagamento='Crédito').delete()
+            # As parcelas mudam os meses com dados, então o índice de meses é refeito junto
+            for user_id in usuarios:
+                reconstruir_meses(user_id)
+            marcar_alteracao(*usuarios)
+            self.stdout.write(self.style.SUCCESS('Parcelas regeradas.'))
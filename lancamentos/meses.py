@@ -0,0 +1,100 @@
+# Dentro de lancamentos/meses.py
+import datetime
+from asgiref.sync import sync_to_async
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from .models import Lancamento, Receita, Parcela, MesDisponivel
+
+# --- ÍNDICE DE MESES COM DADOS (usado nos filtros de ano/mês) ---
+# Um mês entra no índice quando tem uma receita, um gasto à vista ou uma parcela
+# de crédito vencendo nele. Inclusões são feitas na hora; nas edições e exclusões
+# só os meses que deixaram de ser referenciados são conferidos de novo.
+
+def _ano_mes(data):
+    return (data.year, data.month)
+
+def intervalo_do_mes(ano, mes):
+    """ (primeiro dia do mês, primeiro dia do mês seguinte), para filtros por intervalo que usam os índices. """
+    inicio = datetime.date(ano, mes, 1)
+    return inicio, inicio + relativedelta(months=1)
+
+def meses_do_lancamento(lancamento, parcelas):
+    """ Meses em que um lançamento recém-salvo aparece, dadas as parcelas que acabaram de ser geradas. """
+    if lancamento.metodo_pagamento == 'Crédito':
+        return {_ano_mes(p.data_vencimento) for p in parcelas}
+    data_compra = Lancamento._meta.get_field('data_compra').to_python(lancamento.data_compra)
+    return {_ano_mes(data_compra)}
+
+def meses_da_receita(receita):
+    return {_ano_mes(Receita._meta.get_field('data_recebimento').to_python(receita.data_recebimento))}
+
+def meses_do_lancamento_no_banco(pk):
+    """ Usuário e meses de um lançamento como estão gravados no banco (antes de uma edição). """
+    anterior = Lancamento.objects.filter(pk=pk).values('user_id', 'metodo_pagamento', 'data_compra').first()
+    if not anterior:
+        return None, set()
+    if anterior['metodo_pagamento'] == 'Crédito':
+        meses = {_ano_mes(d) for d in Parcela.objects.filter(lancamento_id=pk).dates('data_vencimento', 'month')}
+    else:
+        meses = {_ano_mes(anterior['data_compra'])}
+    return anterior['user_id'], meses
+
+def meses_da_receita_no_banco(pk):
+    anterior = Receita.objects.filter(pk=pk).values('user_id', 'data_recebimento').first()
+    if not anterior:
+        return None, set()
+    return anterior['user_id'], {_ano_mes(anterior['data_recebimento'])}
+
+def registrar_meses(user_id, meses):
+    if user_id is None or not meses:
+        return
+    MesDisponivel.objects.bulk_create(
+        [MesDisponivel(user_id=user_id, ano=ano, mes=mes) for ano, mes in meses],
+        ignore_conflicts=True,
+    )
+
+def mes_tem_dados(user_id, ano, mes):
+    inicio, fim = intervalo_do_mes(ano, mes)
+    return (
+        Receita.objects.filter(user_id=user_id, data_recebimento__gte=inicio, data_recebimento__lt=fim).exists()
+        or Lancamento.objects.filter(user_id=user_id, data_compra__gte=inicio, data_compra__lt=fim).exclude(metodo_pagamento='Crédito').exists()
+        or Parcela.objects.filter(user_id=user_id, data_vencimento__gte=inicio, data_vencimento__lt=fim).exists()
+    )
+
+def revisar_meses(user_id, meses):
+    """ Remove do índice os meses informados que não têm mais nenhum dado. """
+    if user_id is None:
+        return
+    for ano, mes in meses:
+        if not mes_tem_dados(user_id, ano, mes):
+            MesDisponivel.objects.filter(user_id=user_id, ano=ano, mes=mes).delete()
+
+def atualizar_meses(user_id, meses_atuais, user_id_anterior=None, meses_anteriores=()):
+    """ Registra os meses atuais e revisa os que só existiam na versão anterior do registro. """
+    registrar_meses(user_id, meses_atuais)
+    if user_id_anterior is None:
+        return
+    if user_id_anterior == user_id:
+        revisar_meses(user_id, set(meses_anteriores) - set(meses_atuais))
+    else:
+        revisar_meses(user_id_anterior, meses_anteriores)
+
+def reconstruir_meses(user_id):
+    """ Recalcula todo o índice de um usuário (usado após alterações em massa). """
+    meses = set()
+    meses.update(_ano_mes(d) for d in Receita.objects.filter(user_id=user_id).dates('data_recebimento', 'month'))
+    meses.update(_ano_mes(d) for d in Lancamento.objects.filter(user_id=user_id).exclude(metodo_pagamento='Crédito').dates('data_compra', 'month'))
+    meses.update(_ano_mes(d) for d in Parcela.objects.filter(user_id=user_id).dates('data_vencimento', 'month'))
+    with transaction.atomic():
+        MesDisponivel.objects.filter(user_id=user_id).delete()
+        registrar_meses(user_id, meses)
+
+def meses_por_ano(user):
+    """ {ano: [meses]} a partir do índice, em uma única consulta. """
+    anos_meses = {}
+    for ano, mes in MesDisponivel.objects.filter(user=user).values_list('ano', 'mes'):
+        anos_meses.setdefault(ano, []).append(mes)
+    return anos_meses
+
+async def ameses_por_ano(user):
+    return await sync_to_async(meses_por_ano)(user)
@@ -0,0 +1,107 @@
+# Dentro de lancamentos/metricas.py
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+
+# --- MÉTRICAS POR REQUISIÇÃO ---
+# Conta as consultas SQL de cada requisição (via execute_wrapper, funciona sem DEBUG),
+# mede o tempo no banco, o tempo em Python e o tamanho da resposta, e:
+#   - devolve os números no cabeçalho Server-Timing (aparecem no DevTools do navegador);
+#   - acumula por nome de URL, em memória do processo, para a página /metricas/ (staff).
+# Em respostas em streaming as linhas são geradas depois que a view retorna: contam só
+# as consultas feitas até o início da resposta e o tamanho fica em branco.
+# Em ASGI o ORM roda na thread "sensível" da requisição (sync_to_async), então o
+# contador é instalado na conexão dessa thread, e não na do loop de eventos.
+
+class _Medicao:
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_sql = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo_sql += time.perf_counter() - inicio
+            self.consultas += 1
+
+# Acumulado de cada URL: {nome: {'requisicoes', 'consultas', 'max_consultas', 'tempo_sql', 'tempo_python', 'bytes'}}
+_estatisticas = {}
+_trava = threading.Lock()
+
+def registrar(nome, consultas, tempo_sql, tempo_total, tamanho):
+    with _trava:
+        linha = _estatisticas.setdefault(nome, {'requisicoes': 0, 'consultas': 0, 'max_consultas': 0, 'tempo_sql': 0.0, 'tempo_python': 0.0, 'bytes': 0})
+        linha['requisicoes'] += 1
+        linha['consultas'] += consultas
+        linha['max_consultas'] = max(linha['max_consultas'], consultas)
+        linha['tempo_sql'] += tempo_sql
+        linha['tempo_python'] += tempo_total - tempo_sql
+        linha['bytes'] += tamanho or 0
+
+def estatisticas():
+    """ Médias por URL (tempos em ms), da mais lenta para a mais rápida. """
+    with _trava:
+        copia = {nome: dict(linha) for nome, linha in _estatisticas.items()}
+    linhas = []
+    for nome, linha in copia.items():
+        n = linha['requisicoes']
+        linhas.append({
+            'nome': nome, 'requisicoes': n, 'max_consultas': linha['max_consultas'],
+            'consultas': linha['consultas'] / n, 'tempo_sql': linha['tempo_sql'] * 1000 / n,
+            'tempo_python': linha['tempo_python'] * 1000 / n, 'bytes': linha['bytes'] / n,
+        })
+    return sorted(linhas, key=lambda linha: linha['tempo_sql'] + linha['tempo_python'], reverse=True)
+
+def zerar():
+    with _trava:
+        _estatisticas.clear()
+
+def _nome_da_url(request):
+    correspondencia = getattr(request, 'resolver_match', None)
+    return correspondencia.view_name if correspondencia else '(sem rota)'
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicao = _Medicao()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(medicao):
+            response = self.get_response(request)
+        return self._finalizar(request, response, medicao, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        medicao = _Medicao()
+        inicio = time.perf_counter()
+        await sync_to_async(_instalar)(medicao)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remover)(medicao)
+        return self._finalizar(request, response, medicao, time.perf_counter() - inicio)
+
+    def _finalizar(self, request, response, medicao, tempo_total):
+        tamanho = None if response.streaming else len(response.content)
+        registrar(_nome_da_url(request), medicao.consultas, medicao.tempo_sql, tempo_total, tamanho)
+        response['Server-Timing'] = (
+            f'sql;dur={medicao.tempo_sql * 1000:.1f};desc="{medicao.consultas} consultas", '
+            f'app;dur={(tempo_total - medicao.tempo_sql) * 1000:.1f}'
+        )
+        return response
+
+def _instalar(medicao):
+    connection.execute_wrappers.append(medicao)
+
+def _remover(medicao):
+    connection.execute_wrappers.remove(medicao)
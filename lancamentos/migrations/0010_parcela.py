@@ -0,0 +1,82 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:33
+
+import datetime
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from lancamentos.vencimentos import calcular_cronograma, DIA_FECHAMENTO_GLOBAL, DIA_VENCIMENTO_GLOBAL
+
+TAMANHO_LOTE = 500
+
+
+def _criar_parcelas(Parcela, lancamentos):
+    """ Mesma regra de lancamentos/parcelas.py (gerar_parcelas), com os modelos históricos. """
+    compras = []
+    for lancamento in lancamentos:
+        data_compra = lancamento.data_compra
+        if isinstance(data_compra, datetime.datetime): data_compra = data_compra.date()
+        if lancamento.cartao_id:
+            dia_fechamento, dia_vencimento = int(lancamento.cartao.dia_fechamento), int(lancamento.cartao.dia_vencimento)
+        else:
+            dia_fechamento, dia_vencimento = DIA_FECHAMENTO_GLOBAL, DIA_VENCIMENTO_GLOBAL
+        compras.append((data_compra, int(lancamento.num_parcelas or 1), lancamento.valor_total, dia_fechamento, dia_vencimento))
+    cronograma = calcular_cronograma(compras)
+    parcelas = []
+    for i in range(len(cronograma)):
+        lancamento = lancamentos[cronograma.compra[i]]
+        parcelas.append(Parcela(
+            lancamento_id=lancamento.pk,
+            user_id=lancamento.user_id,
+            cartao_id=lancamento.cartao_id,
+            categoria_id=lancamento.categoria_id,
+            numero=int(cronograma.numero[i]),
+            data_vencimento=cronograma.data(i),
+            valor=Decimal(int(cronograma.centavos[i])) / 100,
+        ))
+    Parcela.objects.bulk_create(parcelas, batch_size=TAMANHO_LOTE)
+
+
+def gerar_parcelas_existentes(apps, schema_editor):
+    """ Materializa as parcelas dos lançamentos de crédito que já existem (o índice de meses da 0011 depende delas). """
+    Lancamento = apps.get_model('lancamentos', 'Lancamento')
+    Parcela = apps.get_model('lancamentos', 'Parcela')
+    lote = []
+    for lancamento in Lancamento.objects.filter(metodo_pagamento='Crédito').select_related('cartao').order_by('pk').iterator(chunk_size=TAMANHO_LOTE):
+        lote.append(lancamento)
+        if len(lote) >= TAMANHO_LOTE:
+            _criar_parcelas(Parcela, lote)
+            lote = []
+    if lote:
+        _criar_parcelas(Parcela, lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lancamentos', '0009_remove_perfil_limite_cartao_cartaodecredito_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Parcela',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField(verbose_name='Nº da Parcela')),
+                ('data_vencimento', models.DateField(verbose_name='Data de Vencimento')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor da Parcela')),
+                ('cartao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='lancamentos.cartaodecredito')),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='lancamentos.categoria')),
+                ('lancamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parcelas', to='lancamentos.lancamento')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['data_vencimento', 'numero'],
+                'indexes': [models.Index(fields=['user', 'data_vencimento'], name='lancamentos_user_id_e049fb_idx'), models.Index(fields=['cartao', 'data_vencimento'], name='lancamentos_cartao__9f0fd0_idx')],
+            },
+        ),
+        migrations.RunPython(gerar_parcelas_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def popular_meses(apps, schema_editor):
+    """ Preenche o índice com os meses que já têm receitas, gastos à vista ou parcelas. """
+    MesDisponivel = apps.get_model('lancamentos', 'MesDisponivel')
+    fontes = [
+        (apps.get_model('lancamentos', 'Receita').objects.all(), 'data_recebimento'),
+        (apps.get_model('lancamentos', 'Lancamento').objects.exclude(metodo_pagamento='Crédito'), 'data_compra'),
+        (apps.get_model('lancamentos', 'Parcela').objects.all(), 'data_vencimento'),
+    ]
+    meses = set()
+    for queryset, campo in fontes:
+        for user_id, data in queryset.filter(user__isnull=False).values_list('user_id', campo):
+            meses.add((user_id, data.year, data.month))
+    MesDisponivel.objects.bulk_create(
+        [MesDisponivel(user_id=user_id, ano=ano, mes=mes) for user_id, ano, mes in meses],
+        batch_size=500, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lancamentos', '0010_parcela'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MesDisponivel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.PositiveSmallIntegerField(verbose_name='Ano')),
+                ('mes', models.PositiveSmallIntegerField(verbose_name='Mês')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meses_disponiveis', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Mês Disponível',
+                'verbose_name_plural': 'Meses Disponíveis',
+                'ordering': ['ano', 'mes'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'ano', 'mes'), name='mes_disponivel_unico_por_usuario')],
+            },
+        ),
+        migrations.RunPython(popular_meses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lancamentos', '0011_mesdisponivel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['user', 'data_compra'], name='lancamentos_user_id_ac08c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['user', 'metodo_pagamento', 'data_compra'], name='lancamentos_user_id_f1123c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['user', 'cartao'], name='lancamentos_user_id_09f157_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='receita',
+            index=models.Index(fields=['user', 'data_recebimento'], name='lancamentos_user_id_c24927_idx'),
+        ),
+    ]
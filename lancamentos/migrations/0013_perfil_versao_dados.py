@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lancamentos', '0012_indices_de_consulta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfil',
+            name='versao_dados',
+            field=models.PositiveIntegerField(default=0, verbose_name='Versão dos Dados'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lancamentos', '0013_perfil_versao_dados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegraCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('padrao', models.CharField(help_text="Ex: 'ifood', 'posto', 'farmácia'. Maiúsculas e acentos são ignorados.", max_length=100, verbose_name='Texto')),
+                ('prioridade', models.IntegerField(default=0, help_text='Em caso de empate, vence a regra de maior prioridade.', verbose_name='Prioridade')),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regras', to='lancamentos.categoria')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regras_categoria', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Regra de Categoria',
+                'verbose_name_plural': 'Regras de Categoria',
+                'ordering': ['-prioridade', 'padrao'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'padrao'), name='regra_categoria_unica_por_usuario')],
+            },
+        ),
+    ]
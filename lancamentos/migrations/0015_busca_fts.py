@@ -0,0 +1,47 @@
+# Índice de busca textual (SQLite FTS5) sobre local_compra e descricao dos lançamentos
+
+from django.db import migrations
+
+# Tabela de conteúdo externo: o texto fica só em lancamentos_lancamento e os triggers
+# mantêm o índice em dia, inclusive em bulk_create, update() e importações.
+# Só funciona no SQLite (FTS5). E o Django não sabe desses triggers: uma migração que
+# recrie lancamentos_lancamento (o SQLite refaz a tabela em quase todo AlterField)
+# apaga os três, e ela precisa recriá-los e rodar o 'rebuild' de novo.
+# BuscaTests.test_triggers_continuam_no_banco acusa quando isso acontecer.
+CRIAR = [
+    """CREATE VIRTUAL TABLE lancamentos_busca USING fts5(
+        local_compra, descricao,
+        content='lancamentos_lancamento', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER lancamentos_busca_ai AFTER INSERT ON lancamentos_lancamento BEGIN
+        INSERT INTO lancamentos_busca(rowid, local_compra, descricao) VALUES (new.id, new.local_compra, new.descricao);
+    END""",
+    """CREATE TRIGGER lancamentos_busca_ad AFTER DELETE ON lancamentos_lancamento BEGIN
+        INSERT INTO lancamentos_busca(lancamentos_busca, rowid, local_compra, descricao) VALUES ('delete', old.id, old.local_compra, old.descricao);
+    END""",
+    """CREATE TRIGGER lancamentos_busca_au AFTER UPDATE OF local_compra, descricao ON lancamentos_lancamento BEGIN
+        INSERT INTO lancamentos_busca(lancamentos_busca, rowid, local_compra, descricao) VALUES ('delete', old.id, old.local_compra, old.descricao);
+        INSERT INTO lancamentos_busca(rowid, local_compra, descricao) VALUES (new.id, new.local_compra, new.descricao);
+    END""",
+    # Indexa os lançamentos que já existem
+    "INSERT INTO lancamentos_busca(lancamentos_busca) VALUES ('rebuild')",
+]
+
+REMOVER = [
+    'DROP TRIGGER IF EXISTS lancamentos_busca_au',
+    'DROP TRIGGER IF EXISTS lancamentos_busca_ad',
+    'DROP TRIGGER IF EXISTS lancamentos_busca_ai',
+    'DROP TABLE IF EXISTS lancamentos_busca',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lancamentos', '0014_regracategoria'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CRIAR, REMOVER),
+    ]
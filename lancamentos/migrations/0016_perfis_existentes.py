@@ -0,0 +1,23 @@
+# Cria o Perfil dos usuários cadastrados antes dele: marcar_alteracao só avança Perfis que existem
+
+from django.conf import settings
+from django.db import migrations
+
+
+def criar_perfis(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Perfil = apps.get_model('lancamentos', 'Perfil')
+    sem_perfil = User.objects.exclude(pk__in=Perfil.objects.values('user_id')).values_list('pk', flat=True)
+    Perfil.objects.bulk_create([Perfil(user_id=user_id) for user_id in sem_perfil], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lancamentos', '0015_busca_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_perfis, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,11 @@
 # Dentro de lancamentos/models.py
+import datetime
+from dateutil.relativedelta import relativedelta
 from django.db import models
+from django.db.models import Max
 from django.contrib.auth.models import User
 from decimal import Decimal
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 from django.dispatch import receiver
 
 # --- MODELO DE PERFIL (MODIFICADO) ---
@@ -10,6 +13,8 @@ from django.dispatch import receiver
 class Perfil(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     # O campo de limite foi removido daqui
+    # Avança a cada alteração nos dados do usuário; invalida os caches (ver lancamentos/versao.py)
+    versao_dados = models.PositiveIntegerField("Versão dos Dados", default=0)
 
     def __str__(self):
         return f"Perfil de {self.user.username}"
@@ -54,8 +59,26 @@ class Categoria(models.Model):
             return f"{self.nome} ({self.user.username})"
         return f"{self.nome} (Sem usuário)"
 
+class LancamentoQuerySet(models.QuerySet):
+    def com_vencimento_no_mes(self, ano, mes):
+        """ Compras de crédito que podem ter parcela vencendo em (ano, mes).
+
+        A primeira parcela vence no máximo 2 meses depois da compra (fechamento depois
+        do vencimento), então uma compra de N parcelas só alcança meses até N + 1 meses
+        após a data da compra. O limite usa o maior num_parcelas do próprio queryset.
+        """
+        credito = self.filter(metodo_pagamento='Crédito')
+        max_parcelas = credito.aggregate(maximo=Max('num_parcelas'))['maximo'] or 1
+        inicio_do_mes = datetime.date(ano, mes, 1)
+        return credito.filter(
+            data_compra__gte=inicio_do_mes - relativedelta(months=max(max_parcelas, 1) + 1),
+            data_compra__lt=inicio_do_mes + relativedelta(months=1),
+        )
+
 class Lancamento(models.Model):
     METODO_PAGAMENTO_CHOICES = [('Crédito', 'Crédito'), ('Débito', 'Débito'), ('PIX', 'PIX'), ('Dinheiro', 'Dinheiro')]
+    # Limite aceito nos formulários e na importação (30 anos de parcelas mensais)
+    MAX_PARCELAS = 360
     local_compra = models.CharField("Local da Compra", max_length=200)
     descricao = models.TextField("Descrição", blank=True, null=True)
     data_compra = models.DateField("Data da Compra")
@@ -68,6 +91,17 @@ class Lancamento(models.Model):
     num_parcelas = models.IntegerField("Nº de Parcelas", default=1)
     categoria = models.ForeignKey(Categoria, on_delete=models.PROTECT)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+
+    objects = LancamentoQuerySet.as_manager()
+
+    class Meta:
+        # Os mesmos caminhos de acesso das telas: mês do usuário, método de pagamento e cartão
+        indexes = [
+            models.Index(fields=['user', 'data_compra']),
+            models.Index(fields=['user', 'metodo_pagamento', 'data_compra']),
+            models.Index(fields=['user', 'cartao']),
+        ]
+
     def __str__(self):
         data_formatada = self.data_compra.strftime('%d/%m/%Y')
         return f"{self.local_compra} em {data_formatada}"
@@ -79,17 +113,178 @@ class Receita(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     class Meta:
         ordering = ['-data_recebimento']
+        indexes = [
+            models.Index(fields=['user', 'data_recebimento']),
+        ]
     def __str__(self):
         return f"{self.descricao} - R$ {self.valor}"
 
+# --- PARCELAS MATERIALIZADAS DOS LANÇAMENTOS DE CRÉDITO ---
+# Cada compra no crédito gera uma linha por parcela, já com a data de vencimento
+# calculada. Assim a fatura de um mês é uma consulta por intervalo de datas, em vez
+# de recalcular o cronograma de todas as compras a cada requisição.
+# As linhas são mantidas pelos sinais abaixo (ver lancamentos/parcelas.py).
+class Parcela(models.Model):
+    lancamento = models.ForeignKey(Lancamento, on_delete=models.CASCADE, related_name='parcelas')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    cartao = models.ForeignKey(CartaoDeCredito, on_delete=models.CASCADE, null=True, blank=True)
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE)
+    numero = models.PositiveSmallIntegerField("Nº da Parcela")
+    data_vencimento = models.DateField("Data de Vencimento")
+    valor = models.DecimalField("Valor da Parcela", max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ['data_vencimento', 'numero']
+        indexes = [
+            models.Index(fields=['user', 'data_vencimento']),
+            models.Index(fields=['cartao', 'data_vencimento']),
+        ]
+
+    def __str__(self):
+        return f"{self.lancamento} - parcela {self.numero}/{self.lancamento.num_parcelas}"
+
+# --- ÍNDICE DE MESES COM DADOS ---
+# Alimenta os filtros de ano/mês de todas as telas com uma única consulta.
+# Mantido pelos sinais abaixo (ver lancamentos/meses.py).
+class MesDisponivel(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='meses_disponiveis')
+    ano = models.PositiveSmallIntegerField("Ano")
+    mes = models.PositiveSmallIntegerField("Mês")
+
+    class Meta:
+        ordering = ['ano', 'mes']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ano', 'mes'], name='mes_disponivel_unico_por_usuario'),
+        ]
+        verbose_name = "Mês Disponível"
+        verbose_name_plural = "Meses Disponíveis"
+
+    def __str__(self):
+        return f"{self.mes:02d}/{self.ano} ({self.user.username})"
+
+# --- REGRAS DE CATEGORIZAÇÃO AUTOMÁTICA ---
+# Um trecho de texto que, encontrado no local ou na descrição de uma compra, indica a
+# categoria. As regras do usuário são compiladas juntas (ver lancamentos/regras.py).
+class RegraCategoria(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='regras_categoria')
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='regras')
+    padrao = models.CharField("Texto", max_length=100, help_text="Ex: 'ifood', 'posto', 'farmácia'. Maiúsculas e acentos são ignorados.")
+    prioridade = models.IntegerField("Prioridade", default=0, help_text="Em caso de empate, vence a regra de maior prioridade.")
+
+    class Meta:
+        ordering = ['-prioridade', 'padrao']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'padrao'], name='regra_categoria_unica_por_usuario'),
+        ]
+        verbose_name = "Regra de Categoria"
+        verbose_name_plural = "Regras de Categoria"
+
+    def __str__(self):
+        return f"'{self.padrao}' → {self.categoria.nome}"
+
 # --- SINAIS (Corrigidos para criar Perfil) ---
+# Só a criação do User gera o Perfil: os demais saves (como o last_login de cada
+# login) não custam nenhuma consulta extra. Usuários antigos ganham o seu na migração
+# 0016 ou, se ainda faltar, na primeira leitura da versão (ver lancamentos/versao.py).
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
     """ Cria um Perfil apenas quando um novo User é criado. """
-    if created:
+    if created and not raw:
         Perfil.objects.create(user=instance)
 
-# Garantir que usuários existentes também tenham um perfil
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    Perfil.objects.get_or_create(user=instance)
\ No newline at end of file
+# --- SINAIS DAS PARCELAS E DO ÍNDICE DE MESES ---
+# A exclusão de um lançamento remove as parcelas via CASCADE.
+@receiver(pre_save, sender=Lancamento)
+def guardar_meses_lancamento(sender, instance, raw=False, **kwargs):
+    """ Guarda onde o lançamento aparecia antes da edição, para revisar o índice de meses. """
+    instance._meses_anteriores = (None, set())
+    if raw or not instance.pk:
+        return
+    from .meses import meses_do_lancamento_no_banco
+    instance._meses_anteriores = meses_do_lancamento_no_banco(instance.pk)
+
+@receiver(post_save, sender=Lancamento)
+def atualizar_parcelas_lancamento(sender, instance, raw=False, **kwargs):
+    """ Regera as parcelas sempre que um lançamento é criado ou editado. """
+    if raw:
+        return
+    from .parcelas import sincronizar_parcelas
+    from .meses import atualizar_meses, meses_do_lancamento
+    from .versao import marcar_alteracao
+    parcelas = sincronizar_parcelas(instance)
+    user_id_anterior, meses_anteriores = getattr(instance, '_meses_anteriores', (None, set()))
+    atualizar_meses(instance.user_id, meses_do_lancamento(instance, parcelas), user_id_anterior, meses_anteriores)
+    marcar_alteracao(instance.user_id, user_id_anterior)
+
+@receiver(pre_delete, sender=Lancamento)
+def guardar_meses_lancamento_excluido(sender, instance, **kwargs):
+    from .meses import meses_do_lancamento_no_banco
+    instance._meses_anteriores = meses_do_lancamento_no_banco(instance.pk)
+
+@receiver(post_delete, sender=Lancamento)
+def revisar_meses_lancamento_excluido(sender, instance, **kwargs):
+    from .meses import revisar_meses
+    from .versao import marcar_alteracao
+    user_id, meses = getattr(instance, '_meses_anteriores', (None, set()))
+    revisar_meses(user_id, meses)
+    marcar_alteracao(instance.user_id)
+
+@receiver(pre_save, sender=Receita)
+def guardar_meses_receita(sender, instance, raw=False, **kwargs):
+    instance._meses_anteriores = (None, set())
+    if raw or not instance.pk:
+        return
+    from .meses import meses_da_receita_no_banco
+    instance._meses_anteriores = meses_da_receita_no_banco(instance.pk)
+
+@receiver(post_save, sender=Receita)
+def atualizar_meses_receita(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .meses import atualizar_meses, meses_da_receita
+    from .versao import marcar_alteracao
+    user_id_anterior, meses_anteriores = getattr(instance, '_meses_anteriores', (None, set()))
+    atualizar_meses(instance.user_id, meses_da_receita(instance), user_id_anterior, meses_anteriores)
+    marcar_alteracao(instance.user_id, user_id_anterior)
+
+@receiver(post_delete, sender=Receita)
+def revisar_meses_receita_excluida(sender, instance, **kwargs):
+    from .meses import revisar_meses, meses_da_receita
+    from .versao import marcar_alteracao
+    revisar_meses(instance.user_id, meses_da_receita(instance))
+    marcar_alteracao(instance.user_id)
+
+@receiver(pre_save, sender=CartaoDeCredito)
+def guardar_dias_do_cartao(sender, instance, raw=False, **kwargs):
+    """ Guarda os dias de fechamento/vencimento anteriores para detectar mudanças. """
+    instance._dias_anteriores = None
+    if raw or not instance.pk:
+        return
+    instance._dias_anteriores = CartaoDeCredito.objects.filter(pk=instance.pk).values_list('dia_fechamento', 'dia_vencimento').first()
+
+@receiver(post_save, sender=CartaoDeCredito)
+def atualizar_parcelas_cartao(sender, instance, created, raw=False, **kwargs):
+    """ Se o fechamento ou o vencimento mudou, todas as parcelas do cartão mudam de data. """
+    if raw or created:
+        return
+    dias_anteriores = getattr(instance, '_dias_anteriores', None)
+    if dias_anteriores == (int(instance.dia_fechamento), int(instance.dia_vencimento)):
+        return
+    from .parcelas import reconstruir_parcelas
+    from .meses import reconstruir_meses
+    reconstruir_parcelas(Lancamento.objects.filter(cartao=instance, metodo_pagamento='Crédito'))
+    reconstruir_meses(instance.user_id)
+
+# Nome, limite e dias do cartão e nome/macro da categoria aparecem nas telas em cache;
+# as regras de categoria entram na versão para o classificador ser recompilado
+@receiver(post_save, sender=CartaoDeCredito)
+@receiver(post_delete, sender=CartaoDeCredito)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=RegraCategoria)
+@receiver(post_delete, sender=RegraCategoria)
+def marcar_alteracao_cadastro(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .versao import marcar_alteracao
+    marcar_alteracao(instance.user_id)
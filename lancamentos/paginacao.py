@@ -0,0 +1,54 @@
+# Dentro de lancamentos/paginacao.py
+import datetime
+from django.db.models import Q
+
+# --- PAGINAÇÃO POR CHAVE (KEYSET) ---
+# As listas andam pela chave (data, id) em vez de OFFSET: cada página continua de
+# onde a outra parou com "data >= x AND (data > x OR id > y)", e o índice
+# (user, data) começa a leitura já no ponto certo, sem reler as páginas
+# anteriores. O cursor vai na URL como 'AAAA-MM-DD_id'.
+TAMANHO_PAGINA = 100
+
+def cursor_de(data, pk):
+    return f'{data.isoformat()}_{pk}'
+
+def ler_cursor(texto):
+    """ 'AAAA-MM-DD_id' -> (data, id); None se vazio ou inválido. """
+    try:
+        data, pk = texto.split('_')
+        return datetime.date.fromisoformat(data), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+def pagina_por_chave(queryset, campo_data, depois=None, antes=None, tamanho=TAMANHO_PAGINA):
+    """ Uma página do queryset em ordem (campo_data, id), com os cursores da página anterior e da próxima.
+
+    `depois` e `antes` são cursores já lidos (ver ler_cursor); sem nenhum, é a primeira página.
+    Devolve {'itens': [...], 'anterior': cursor ou None, 'proxima': cursor ou None}.
+    """
+    if antes:
+        data, pk = antes
+        consulta = (queryset
+            .filter(Q(**{f'{campo_data}__lt': data}) | Q(**{campo_data: data, 'pk__lt': pk}), **{f'{campo_data}__lte': data})
+            .order_by(f'-{campo_data}', '-pk'))
+        itens = list(consulta[:tamanho + 1])
+        tem_anterior = len(itens) > tamanho
+        itens = itens[:tamanho][::-1]
+        tem_proxima = bool(itens)
+    else:
+        consulta = queryset.order_by(campo_data, 'pk')
+        if depois:
+            data, pk = depois
+            consulta = consulta.filter(Q(**{f'{campo_data}__gt': data}) | Q(**{campo_data: data, 'pk__gt': pk}), **{f'{campo_data}__gte': data})
+        itens = list(consulta[:tamanho + 1])
+        tem_proxima = len(itens) > tamanho
+        itens = itens[:tamanho]
+        tem_anterior = bool(depois and itens)
+
+    def cursor(item):
+        return cursor_de(getattr(item, campo_data), item.pk)
+    return {
+        'itens': itens,
+        'anterior': cursor(itens[0]) if tem_anterior else None,
+        'proxima': cursor(itens[-1]) if tem_proxima else None,
+    }
@@ -0,0 +1,70 @@
+# Dentro de lancamentos/parcelas.py
+import datetime
+from decimal import Decimal
+from django.db import transaction
+from .models import Lancamento, Parcela
+from .vencimentos import calcular_cronograma, DIA_FECHAMENTO_GLOBAL, DIA_VENCIMENTO_GLOBAL
+from .versao import marcar_alteracao
+
+# Quantos lançamentos são regerados por vez nas reconstruções em lote
+TAMANHO_LOTE = 500
+
+# --- GERAÇÃO DAS PARCELAS ---
+def _dados_da_compra(lancamento):
+    # Nos saves feitos pelas views os campos ainda podem estar como texto do POST
+    data_compra = Lancamento._meta.get_field('data_compra').to_python(lancamento.data_compra)
+    if isinstance(data_compra, datetime.datetime): data_compra = data_compra.date()
+    if lancamento.cartao_id:
+        dia_fechamento, dia_vencimento = int(lancamento.cartao.dia_fechamento), int(lancamento.cartao.dia_vencimento)
+    else:
+        dia_fechamento, dia_vencimento = DIA_FECHAMENTO_GLOBAL, DIA_VENCIMENTO_GLOBAL
+    return (data_compra, int(lancamento.num_parcelas or 1), lancamento.valor_total, dia_fechamento, dia_vencimento)
+
+def gerar_parcelas(lancamentos):
+    """ Monta (sem salvar) as parcelas de uma lista de lançamentos; os que não são de crédito são ignorados. """
+    lancamentos = [l for l in lancamentos if l.metodo_pagamento == 'Crédito']
+    cronograma = calcular_cronograma([_dados_da_compra(l) for l in lancamentos])
+
+    parcelas = []
+    for i in range(len(cronograma)):
+        lancamento = lancamentos[cronograma.compra[i]]
+        parcelas.append(Parcela(
+            lancamento_id=lancamento.pk,
+            user_id=lancamento.user_id,
+            cartao_id=lancamento.cartao_id,
+            categoria_id=lancamento.categoria_id,
+            numero=int(cronograma.numero[i]),
+            data_vencimento=cronograma.data(i),
+            valor=Decimal(int(cronograma.centavos[i])) / 100,
+        ))
+    return parcelas
+
+# --- SINCRONIZAÇÃO COM A TABELA DE PARCELAS ---
+def sincronizar_parcelas(lancamento):
+    """ Substitui as parcelas materializadas de um único lançamento e devolve as novas. """
+    with transaction.atomic():
+        Parcela.objects.filter(lancamento_id=lancamento.pk).delete()
+        return Parcela.objects.bulk_create(gerar_parcelas([lancamento]))
+
+def reconstruir_parcelas(lancamentos):
+    """ Regera as parcelas de um queryset de lançamentos em lotes. Retorna quantas parcelas foram criadas. """
+    total_criadas = 0
+    lote = []
+    usuarios = set()
+    with transaction.atomic():
+        for lancamento in lancamentos.select_related('cartao').iterator(chunk_size=TAMANHO_LOTE):
+            lote.append(lancamento)
+            usuarios.add(lancamento.user_id)
+            if len(lote) >= TAMANHO_LOTE:
+                total_criadas += _regerar_lote(lote)
+                lote = []
+        if lote:
+            total_criadas += _regerar_lote(lote)
+        marcar_alteracao(*usuarios)
+    return total_criadas
+
+def _regerar_lote(lancamentos):
+    Parcela.objects.filter(lancamento_id__in=[l.pk for l in lancamentos]).delete()
+    novas = gerar_parcelas(lancamentos)
+    Parcela.objects.bulk_create(novas, batch_size=TAMANHO_LOTE)
+    return len(novas)
@@ -0,0 +1,120 @@
+# Dentro de lancamentos/regras.py
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from django.db import transaction
+from .models import Categoria, CategoriaPadrao, Lancamento, Parcela, RegraCategoria
+from .versao import versao_dos_dados, marcar_alteracao
+
+# Quantos lançamentos são gravados por vez na recategorização em massa
+TAMANHO_LOTE_RECATEGORIZACAO = 1000
+
+# --- CATEGORIZAÇÃO AUTOMÁTICA POR REGRAS ---
+# Todas as regras de um usuário viram uma única expressão regular (uma alternância
+# com os textos normalizados), compilada uma vez por versão dos dados e guardada
+# em memória. Classificar uma compra é uma única busca nessa expressão.
+# Vence o trecho que aparece primeiro no texto; na mesma posição, a regra de maior
+# prioridade e, depois, o texto mais longo ("posto shell" antes de "posto").
+
+def normalizar(texto):
+    """ Minúsculas e sem acentos ('Farmácia São João' -> 'farmacia sao joao'). """
+    return unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode('ascii').lower()
+
+class Classificador:
+    def __init__(self, regras):
+        """ `regras`: (padrao, categoria_id, prioridade). """
+        self.categorias = {}
+        for padrao, categoria_id, _ in sorted(regras, key=lambda regra: (-regra[2], -len(regra[0]))):
+            chave = ' '.join(normalizar(padrao).split())
+            if chave and chave not in self.categorias:
+                self.categorias[chave] = categoria_id
+        alternativas = '|'.join(re.escape(chave) for chave in self.categorias)
+        self._expressao = re.compile(rf'(?<!\w)(?:{alternativas})(?!\w)') if self.categorias else None
+
+    def classificar(self, local, descricao=None):
+        """ id da categoria sugerida para a compra, ou None se nenhuma regra casar. """
+        if self._expressao is None:
+            return None
+        encontrado = self._expressao.search(normalizar(f'{local} {descricao or ""}'))
+        return self.categorias[encontrado.group(0)] if encontrado else None
+
+# Classificadores compilados dos usuários mais recentes: {user_id: (versao_dos_dados, Classificador)}.
+# Fica no processo (a expressão compilada não vale a ida e volta de um cache externo), mas limitado:
+# passando de MAX_CLASSIFICADORES, sai o usado há mais tempo. O lock protege o dicionário entre
+# as threads do servidor; a consulta e a compilação ficam fora dele.
+MAX_CLASSIFICADORES = 256
+_classificadores = OrderedDict()
+_lock_classificadores = threading.Lock()
+
+def classificador_do_usuario(user_id):
+    versao = versao_dos_dados(user_id)
+    with _lock_classificadores:
+        guardado = _classificadores.get(user_id)
+        if guardado and guardado[0] == versao:
+            _classificadores.move_to_end(user_id)
+            return guardado[1]
+    classificador = Classificador(RegraCategoria.objects.filter(user_id=user_id).values_list('padrao', 'categoria_id', 'prioridade'))
+    with _lock_classificadores:
+        _classificadores[user_id] = (versao, classificador)
+        _classificadores.move_to_end(user_id)
+        while len(_classificadores) > MAX_CLASSIFICADORES:
+            _classificadores.popitem(last=False)
+    return classificador
+
+# --- REGRAS INICIAIS ---
+def semear_regras(user):
+    """ Cria regras com os exemplos de cada categoria do usuário (ou da categoria padrão de mesmo nome). Retorna quantas criou. """
+    exemplos_padrao = {p.nome.lower(): p.exemplos for p in CategoriaPadrao.objects.exclude(exemplos__isnull=True).exclude(exemplos='')}
+    existentes = {normalizar(padrao) for padrao in RegraCategoria.objects.filter(user=user).values_list('padrao', flat=True)}
+    novas = []
+    for categoria in Categoria.objects.filter(user=user):
+        exemplos = categoria.exemplos or exemplos_padrao.get(categoria.nome.lower(), '')
+        for exemplo in re.split(r'[,;\n]', exemplos):
+            exemplo = ' '.join(exemplo.strip(' .…').lower().split())[:100]
+            if exemplo and normalizar(exemplo) not in existentes:
+                existentes.add(normalizar(exemplo))
+                novas.append(RegraCategoria(user=user, categoria=categoria, padrao=exemplo))
+    RegraCategoria.objects.bulk_create(novas, ignore_conflicts=True)
+    if novas:
+        marcar_alteracao(user.pk)
+    return len(novas)
+
+# --- RECATEGORIZAÇÃO EM MASSA ---
+def _gravar_lote(lote):
+    Lancamento.objects.bulk_update(lote, ['categoria'], batch_size=TAMANHO_LOTE_RECATEGORIZACAO)
+    # As parcelas guardam a categoria da compra (bulk_update não dispara os sinais)
+    por_categoria = {}
+    for lancamento in lote:
+        por_categoria.setdefault(lancamento.categoria_id, []).append(lancamento.pk)
+    for categoria_id, ids in por_categoria.items():
+        Parcela.objects.filter(lancamento_id__in=ids).update(categoria_id=categoria_id)
+
+def recategorizar(user, lancamentos=None):
+    """ Aplica as regras do usuário aos lançamentos (todos, por padrão). Só muda os que casam com alguma regra.
+
+    Retorna (analisados, alterados).
+    """
+    classificador = classificador_do_usuario(user.pk)
+    if lancamentos is None:
+        lancamentos = Lancamento.objects.filter(user=user)
+    analisados = alterados = 0
+    lote = []
+    with transaction.atomic():
+        for lancamento in lancamentos.only('pk', 'local_compra', 'descricao', 'categoria_id').iterator(chunk_size=TAMANHO_LOTE_RECATEGORIZACAO):
+            analisados += 1
+            categoria_id = classificador.classificar(lancamento.local_compra, lancamento.descricao)
+            if categoria_id is None or categoria_id == lancamento.categoria_id:
+                continue
+            lancamento.categoria_id = categoria_id
+            lote.append(lancamento)
+            if len(lote) >= TAMANHO_LOTE_RECATEGORIZACAO:
+                _gravar_lote(lote)
+                alterados += len(lote)
+                lote = []
+        if lote:
+            _gravar_lote(lote)
+            alterados += len(lote)
+        if alterados:
+            marcar_alteracao(user.pk)
+    return analisados, alterados
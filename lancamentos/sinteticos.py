@@ -0,0 +1,119 @@
+# Dentro de lancamentos/sinteticos.py
+import datetime
+import os
+import random
+import tempfile
+from contextlib import contextmanager, suppress
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections, transaction
+from .models import Categoria, CartaoDeCredito, Lancamento, Parcela, Receita
+from .parcelas import gerar_parcelas
+from .meses import reconstruir_meses
+from .versao import marcar_alteracao
+
+# Quantas compras vão para o banco em cada bulk_create
+TAMANHO_LOTE_SINTETICO = 1000
+
+# --- DADOS SINTÉTICOS (para benchmarks e testes manuais) ---
+# Usuários com anos de histórico parecido com o real: compras espalhadas pelos meses,
+# métodos misturados, parcelamentos de 1 a 24x em vários cartões e receitas mensais.
+# Tudo é gravado em lote (como na importação), então o índice de meses e a versão
+# dos dados são atualizados no final.
+
+CATEGORIAS = {
+    'Mercado': ('Essenciais', ['Supermercado Dia', 'Atacadão', 'Hortifruti', 'Padaria Pão Quente']),
+    'Transporte': ('Essenciais', ['Posto Shell', 'Uber', '99', 'Estacionamento Centro']),
+    'Casa': ('Essenciais', ['Leroy Merlin', 'Conta de Luz', 'Internet Vivo', 'Condomínio']),
+    'Farmácia': ('Saúde', ['Drogaria São Paulo', 'Droga Raia', 'Farmácia Popular']),
+    'Restaurante': ('Estilo de Vida', ['iFood', 'Outback', 'Lanchonete da Esquina', 'Pizzaria Bella']),
+    'Lazer': ('Estilo de Vida', ['Cinemark', 'Spotify', 'Netflix', 'Ingresso.com']),
+    'Vestuário': ('Estilo de Vida', ['Renner', 'C&A', 'Centauro', 'Zara']),
+    'Eletrônicos': ('Estilo de Vida', ['Amazon', 'Magazine Luiza', 'Kabum', 'Fast Shop']),
+    'Educação': ('Desenvolvimento', ['Udemy', 'Livraria Cultura', 'Escola de Idiomas']),
+}
+CARTOES = [('Nubank', 3, 10), ('Inter', 20, 28), ('Itaú', 25, 5), ('C6', 12, 19)]
+# Peso de cada método de pagamento e de cada número de parcelas no crédito
+METODOS = [('Crédito', 60), ('PIX', 20), ('Débito', 15), ('Dinheiro', 5)]
+PARCELAS = [(1, 55), (2, 8), (3, 10), (4, 4), (5, 4), (6, 6), (10, 6), (12, 5), (18, 1), (24, 1)]
+
+def _sortear(aleatorio, pesos):
+    return aleatorio.choices([valor for valor, _ in pesos], weights=[peso for _, peso in pesos])[0]
+
+def gerar_usuario(username, compras, anos=3, num_cartoes=3, semente=0, senha=None):
+    """ Cria um usuário com `compras` lançamentos distribuídos nos últimos `anos` anos. Retorna o User. """
+    aleatorio = random.Random(semente)
+    user = User.objects.create_user(username=username, password=senha)
+    with transaction.atomic():
+        categorias = Categoria.objects.bulk_create([
+            Categoria(nome=nome, macro_categoria=macro, user=user) for nome, (macro, _) in CATEGORIAS.items()
+        ])
+        cartoes = CartaoDeCredito.objects.bulk_create([
+            CartaoDeCredito(user=user, nome=nome, limite=Decimal(aleatorio.choice([3000, 5000, 8000, 15000])), dia_fechamento=fechamento, dia_vencimento=vencimento)
+            for nome, fechamento, vencimento in CARTOES[:max(num_cartoes, 1)]
+        ])
+
+        hoje = datetime.date.today()
+        dias = max((hoje - (hoje - relativedelta(years=anos))).days, 1)
+        lote = []
+        for i in range(compras):
+            categoria = aleatorio.choice(categorias)
+            metodo = _sortear(aleatorio, METODOS)
+            num_parcelas = _sortear(aleatorio, PARCELAS) if metodo == 'Crédito' else 1
+            valor = Decimal(round(aleatorio.lognormvariate(4, 1) * num_parcelas ** 0.5, 2)).quantize(Decimal('0.01')) + Decimal('1.00')
+            lote.append(Lancamento(
+                local_compra=aleatorio.choice(CATEGORIAS[categoria.nome][1]),
+                descricao=f'Compra {i}' if aleatorio.random() < 0.3 else None,
+                data_compra=hoje - datetime.timedelta(days=aleatorio.randrange(dias)),
+                valor_total=valor, metodo_pagamento=metodo, num_parcelas=num_parcelas,
+                cartao=aleatorio.choice(cartoes) if metodo == 'Crédito' else None,
+                categoria=categoria, user=user,
+            ))
+            if len(lote) >= TAMANHO_LOTE_SINTETICO:
+                _gravar_lote(lote)
+                lote = []
+        if lote:
+            _gravar_lote(lote)
+
+        receitas = []
+        for meses_atras in range(anos * 12):
+            mes = (hoje - relativedelta(months=meses_atras)).replace(day=5)
+            receitas.append(Receita(descricao='Salário', valor=Decimal('6500.00'), data_recebimento=mes, user=user))
+            if aleatorio.random() < 0.3:
+                receitas.append(Receita(descricao='Freela', valor=Decimal(aleatorio.randrange(300, 3000)), data_recebimento=mes.replace(day=aleatorio.randint(6, 28)), user=user))
+        Receita.objects.bulk_create(receitas, batch_size=TAMANHO_LOTE_SINTETICO)
+    reconstruir_meses(user.pk)
+    marcar_alteracao(user.pk)
+    return user
+
+def _gravar_lote(lote):
+    Lancamento.objects.bulk_create(lote)
+    Parcela.objects.bulk_create(gerar_parcelas(lote), batch_size=TAMANHO_LOTE_SINTETICO)
+
+# --- BANCO TEMPORÁRIO ---
+def _usar_banco(configuracao):
+    """ Troca o banco "default" deste processo; as threads abrem conexões já com a nova configuração. """
+    connections.close_all()
+    connections.settings['default'].clear()
+    connections.settings['default'].update(configuracao)
+    # A conexão desta thread (se já foi aberta) ainda aponta para o banco anterior
+    with suppress(AttributeError):
+        del connections['default']
+
+@contextmanager
+def banco_temporario(**configuracao):
+    """ Aponta o "default" para um SQLite novo (migrado) numa pasta temporária; o banco real não é tocado.
+
+    Devolve o caminho do arquivo.
+    """
+    original = dict(connections.settings['default'])
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'benchmark.sqlite3')
+        _usar_banco(dict(original, NAME=caminho, **configuracao))
+        try:
+            call_command('migrate', verbosity=0)
+            yield caminho
+        finally:
+            _usar_banco(original)
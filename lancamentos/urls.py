@@ -5,6 +5,7 @@ from . import views
 urlpatterns = [
     path('', views.lista_lancamentos, name='fatura_cartao'),
     path('extrato/', views.extrato_completo, name='extrato_completo'),
+    path('busca/', views.buscar_lancamentos, name='busca'),
     path('balanco/', views.balanco_mensal, name='balanco_mensal'),
     
     path('novo/', views.novo_lancamento, name='novo_lancamento'),
@@ -27,4 +28,10 @@ urlpatterns = [
     path('dashboard-macro/', views.dashboard_macro, name='dashboard_macro'),
     path('api/detalhes-categoria/', views.api_detalhes_categoria, name='api_detalhes_categoria'),
     path('api/detalhes-macro-categoria/', views.api_detalhes_macro_categoria, name='api_detalhes_macro_categoria'),
+    path('api/detalhes-mes/', views.api_detalhes_mes, name='api_detalhes_mes'),
+    path('api/sugerir-categoria/', views.api_sugerir_categoria, name='api_sugerir_categoria'),
+    path('api/projecao/', views.api_projecao, name='api_projecao'),
+    path('exportar/<str:tipo>/', views.exportar, name='exportar'),
+    path('importar/', views.importar_extrato, name='importar_extrato'),
+    path('metricas/', views.pagina_de_metricas, name='metricas'),
 ]
\ No newline at end of file
@@ -0,0 +1,192 @@
+# Dentro de lancamentos/vencimentos.py
+import calendar
+import datetime
+from array import array
+from decimal import Decimal
+from dateutil.relativedelta import relativedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# --- FUNÇÃO AUXILIAR PARA CÁLCULO DE VENCIMENTO (ANTIGA/GLOBAL) ---
+def calcular_data_primeiro_vencimento(data_compra):
+    DIA_FECHAMENTO = 3
+    DIA_VENCIMENTO = 10
+    if isinstance(data_compra, datetime.datetime): data_compra_date = data_compra.date()
+    elif isinstance(data_compra, datetime.date): data_compra_date = data_compra
+    else:
+        try: data_compra_date = datetime.datetime.strptime(str(data_compra), '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+             print(f"Alerta: Formato de data inesperado em calcular_data_primeiro_vencimento: {data_compra}")
+             hoje = datetime.date.today()
+             try: return (hoje + relativedelta(months=1)).replace(day=DIA_VENCIMENTO)
+             except ValueError: return (hoje + relativedelta(months=2)).replace(day=1) - relativedelta(days=1)
+
+    if data_compra_date.day > DIA_FECHAMENTO:
+        vencimento_base = data_compra_date + relativedelta(months=1)
+    else:
+        vencimento_base = data_compra_date
+    try: vencimento = vencimento_base.replace(day=DIA_VENCIMENTO)
+    except ValueError:
+        primeiro_dia_mes_seguinte = vencimento_base.replace(day=1) + relativedelta(months=1)
+        vencimento = primeiro_dia_mes_seguinte - relativedelta(days=1)
+    return vencimento
+
+# --- NOVA FUNÇÃO AUXILIAR DE VENCIMENTO (POR CARTÃO) ---
+def calcular_vencimento_por_cartao(data_compra, cartao):
+    dia_fechamento = cartao.dia_fechamento
+    dia_vencimento = cartao.dia_vencimento
+
+    if isinstance(data_compra, datetime.datetime): data_compra = data_compra.date()
+    elif not isinstance(data_compra, datetime.date):
+        try: data_compra = datetime.datetime.strptime(str(data_compra), '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+             print(f"Alerta: Formato de data inesperado: {data_compra}")
+             return None
+
+    vencimento_base = data_compra
+
+    if dia_vencimento < dia_fechamento:
+        if data_compra.day > dia_fechamento:
+            vencimento_base = data_compra + relativedelta(months=2)
+        else:
+            vencimento_base = data_compra + relativedelta(months=1)
+    else:
+        if data_compra.day > dia_fechamento:
+            vencimento_base = data_compra + relativedelta(months=1)
+        else:
+            vencimento_base = data_compra
+
+    try:
+        data_vencimento = vencimento_base.replace(day=dia_vencimento)
+    except ValueError:
+        primeiro_dia_prox_mes = vencimento_base.replace(day=1) + relativedelta(months=1)
+        data_vencimento = primeiro_dia_prox_mes - relativedelta(days=1)
+
+    return data_vencimento
+
+
+# --- MOTOR DE CRONOGRAMA EM LOTE ---
+# Calcula as parcelas de muitas compras de uma vez, com aritmética inteira de meses
+# (indice = ano * 12 + mes - 1) em vez de relativedelta parcela a parcela. O resultado
+# é o mesmo de calcular_vencimento_por_cartao + relativedelta(months=i), inclusive o
+# ajuste para o último dia do mês. Se o NumPy estiver instalado, o cálculo é vetorizado.
+
+# Regra usada nas compras de crédito sem cartão (ver calcular_data_primeiro_vencimento)
+DIA_FECHAMENTO_GLOBAL = 3
+DIA_VENCIMENTO_GLOBAL = 10
+
+
+def indice_mes(ano, mes):
+    return ano * 12 + mes - 1
+
+def ano_mes_do_indice(indice):
+    return divmod(indice, 12)[0], indice % 12 + 1
+
+def _dias_no_mes(indice):
+    ano, mes = ano_mes_do_indice(indice)
+    return calendar.monthrange(ano, mes)[1]
+
+
+class Cronograma:
+    """ Parcelas de um lote de compras, em arrays paralelos (uma posição por parcela). """
+    __slots__ = ('compra', 'numero', 'mes', 'dia', 'centavos')
+
+    def __init__(self, compra, numero, mes, dia, centavos):
+        self.compra = compra      # posição da compra na lista de entrada
+        self.numero = numero      # 1, 2, ... num_parcelas
+        self.mes = mes            # índice do mês de vencimento (ano * 12 + mes - 1)
+        self.dia = dia            # dia do vencimento
+        self.centavos = centavos  # valor da parcela em centavos
+
+    def __len__(self):
+        return len(self.compra)
+
+    def data(self, i):
+        ano, mes = ano_mes_do_indice(int(self.mes[i]))
+        return datetime.date(ano, mes, int(self.dia[i]))
+
+    def datas(self):
+        return [self.data(i) for i in range(len(self))]
+
+
+def calcular_cronograma(compras, usar_numpy=None):
+    """ Recebe tuplas (data_compra, num_parcelas, valor_total, dia_fechamento, dia_vencimento)
+        e devolve um Cronograma com todas as parcelas, na ordem das compras. """
+    if usar_numpy is None:
+        usar_numpy = np is not None
+    if usar_numpy:
+        if np is None:
+            raise ImportError('O NumPy não está instalado.')
+        return _cronograma_numpy(compras)
+    return _cronograma_python(compras)
+
+
+def _centavos(valor):
+    return int((Decimal(str(valor)) * 100).to_integral_value())
+
+def _primeiro_mes(data_compra, dia_fechamento, dia_vencimento):
+    deslocamento = 1 if data_compra.day > dia_fechamento else 0
+    if dia_vencimento < dia_fechamento:
+        deslocamento += 1
+    return indice_mes(data_compra.year, data_compra.month) + deslocamento
+
+
+def _cronograma_python(compras):
+    compra, numero, mes, dia, centavos = array('l'), array('h'), array('l'), array('b'), array('q')
+    for posicao, (data_compra, num_parcelas, valor_total, dia_fechamento, dia_vencimento) in enumerate(compras):
+        quantidade = num_parcelas if num_parcelas and num_parcelas > 0 else 1
+        total = _centavos(valor_total)
+        base = abs(total) // quantidade * (1 if total >= 0 else -1)
+
+        primeiro_mes = _primeiro_mes(data_compra, dia_fechamento, dia_vencimento)
+        dias_primeiro_mes = _dias_no_mes(primeiro_mes)
+        dia_base = dia_vencimento if 1 <= dia_vencimento <= dias_primeiro_mes else dias_primeiro_mes
+
+        for i in range(quantidade):
+            indice = primeiro_mes + i
+            compra.append(posicao)
+            numero.append(i + 1)
+            mes.append(indice)
+            dia.append(dia_base if dia_base <= 28 else min(dia_base, _dias_no_mes(indice)))
+            centavos.append(total - base * (quantidade - 1) if i == 0 else base)
+    return Cronograma(compra, numero, mes, dia, centavos)
+
+
+def _cronograma_numpy(compras):
+    compras = list(compras)
+    if not compras:
+        vazio = np.zeros(0, dtype=np.int64)
+        return Cronograma(vazio, vazio, vazio, vazio, vazio)
+
+    datas = np.array([c[0] for c in compras], dtype='datetime64[D]')
+    quantidade = np.maximum(np.array([c[1] or 1 for c in compras], dtype=np.int64), 1)
+    total = np.array([_centavos(c[2]) for c in compras], dtype=np.int64)
+    dia_fechamento = np.array([c[3] for c in compras], dtype=np.int64)
+    dia_vencimento = np.array([c[4] for c in compras], dtype=np.int64)
+
+    meses_compra = datas.astype('datetime64[M]')
+    dia_compra = (datas - meses_compra).astype(np.int64) + 1
+    primeiro_mes = (meses_compra.astype(np.int64) + 1970 * 12
+                    + (dia_compra > dia_fechamento) + (dia_vencimento < dia_fechamento))
+
+    def dias_no_mes(indices):
+        inicio = (indices - 1970 * 12).astype('datetime64[M]')
+        return ((inicio + 1).astype('datetime64[D]') - inicio.astype('datetime64[D]')).astype(np.int64)
+
+    dias_primeiro = dias_no_mes(primeiro_mes)
+    dia_base = np.where((dia_vencimento >= 1) & (dia_vencimento <= dias_primeiro), dia_vencimento, dias_primeiro)
+
+    # Expande cada compra em suas parcelas
+    compra = np.repeat(np.arange(len(compras), dtype=np.int64), quantidade)
+    inicio_de_cada = np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+    numero = np.arange(len(compra), dtype=np.int64) - inicio_de_cada + 1
+    mes = primeiro_mes[compra] + numero - 1
+    dia = np.minimum(dia_base[compra], dias_no_mes(mes))
+
+    base = np.abs(total) // quantidade * np.where(total >= 0, 1, -1)
+    primeira = total - base * (quantidade - 1)
+    centavos = np.where(numero == 1, primeira[compra], base[compra])
+    return Cronograma(compra, numero, mes, dia, centavos)
@@ -0,0 +1,114 @@
+# Dentro de lancamentos/versao.py
+import datetime
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+from asgiref.sync import sync_to_async
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.db.models import F
+from django.template.response import TemplateResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from .models import Perfil
+
+# Por quanto tempo uma página fica no cache (a versão dos dados já invalida)
+TEMPO_NO_CACHE = 60 * 60
+
+# --- VERSÃO DOS DADOS DE CADA USUÁRIO ---
+# Um contador no Perfil que avança a cada alteração em lançamentos, receitas,
+# categorias ou cartões. Entra na chave dos caches: quando os dados mudam, a chave
+# muda e o valor antigo simplesmente deixa de ser lido (e expira sozinho).
+
+def versao_dos_dados(user_id):
+    versao = Perfil.objects.filter(user_id=user_id).values_list('versao_dados', flat=True).first()
+    if versao is None:
+        # Usuário sem Perfil: ganha um aqui, na leitura, para as próximas alterações terem onde contar
+        if user_id is not None:
+            Perfil.objects.get_or_create(user_id=user_id)
+        return 0
+    return versao
+
+async def aversao_dos_dados(user_id):
+    return await sync_to_async(versao_dos_dados)(user_id)
+
+def marcar_alteracao(*user_ids):
+    """ Avança a versão dos usuários informados (ids nulos são ignorados).
+
+    Só atualiza: também roda nos post_delete da exclusão de um usuário, quando o Perfil
+    já foi apagado e não pode ser recriado. Perfis que faltam nascem em versao_dos_dados.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        Perfil.objects.filter(user_id__in=user_ids).update(versao_dados=F('versao_dados') + 1)
+
+# --- CACHE DAS TELAS DE CONSULTA ---
+# Guarda o template e o contexto da TemplateResponse, não o HTML: o token CSRF e as
+# mensagens continuam sendo gerados a cada requisição. A data entra na chave porque
+# os meses padrão e as faturas em aberto dependem de "hoje".
+
+def _resumo_dos_parametros(request):
+    parametros = urlencode(sorted((k, v) for k, valores in request.GET.lists() for v in valores))
+    return hashlib.md5(parametros.encode()).hexdigest()
+
+def _chave_da_pagina(request, nome_da_view, user_id, versao):
+    resumo = _resumo_dos_parametros(request)
+    return f'pagina:{nome_da_view}:{user_id}:v{versao}:{datetime.date.today().isoformat()}:{resumo}'
+
+def cache_por_versao(view):
+    """ Cacheia o contexto de uma view GET que devolve TemplateResponse, por usuário + versão + parâmetros.
+
+    Funciona com views síncronas e assíncronas.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def view_assincrona_com_cache(request, *args, **kwargs):
+            # Deixa o usuário em request.user: os templates não precisam carregá-lo de novo
+            request.user = user = await request.auser()
+            if request.method != 'GET' or not user.is_authenticated:
+                return await view(request, *args, **kwargs)
+            chave = _chave_da_pagina(request, view.__name__, user.pk, await aversao_dos_dados(user.pk))
+            guardado = await cache.aget(chave)
+            if guardado is not None:
+                template, contexto = guardado
+                return TemplateResponse(request, template, contexto)
+            resposta = await view(request, *args, **kwargs)
+            if isinstance(resposta, TemplateResponse) and resposta.status_code == 200:
+                await cache.aset(chave, (resposta.template_name, resposta.context_data), TEMPO_NO_CACHE)
+            return resposta
+        return view_assincrona_com_cache
+
+    @wraps(view)
+    def view_com_cache(request, *args, **kwargs):
+        if request.method != 'GET' or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        chave = _chave_da_pagina(request, view.__name__, request.user.pk, versao_dos_dados(request.user.pk))
+        guardado = cache.get(chave)
+        if guardado is not None:
+            template, contexto = guardado
+            return TemplateResponse(request, template, contexto)
+        resposta = view(request, *args, **kwargs)
+        if isinstance(resposta, TemplateResponse) and resposta.status_code == 200:
+            cache.set(chave, (resposta.template_name, resposta.context_data), TEMPO_NO_CACHE)
+        return resposta
+    return view_com_cache
+
+# --- ETAG DAS APIS JSON ---
+def etag_por_versao(request, *args, **kwargs):
+    """ ETag para @condition: muda quando os dados do usuário ou os parâmetros da consulta mudam. """
+    versao = versao_dos_dados(request.user.pk)
+    return f'{request.user.pk}-{versao}-{_resumo_dos_parametros(request)}'
+
+def etag_assincrona_por_versao(view):
+    """ @condition(etag_func=etag_por_versao) para views assíncronas (o @condition chama a etag_func de forma síncrona). """
+    @wraps(view)
+    async def view_com_etag(request, *args, **kwargs):
+        user = await request.auser()
+        etag = quote_etag(f'{user.pk}-{await aversao_dos_dados(user.pk)}-{_resumo_dos_parametros(request)}')
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is None:
+            resposta = await view(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            resposta.headers.setdefault('ETag', etag)
+        return resposta
+    return view_com_etag
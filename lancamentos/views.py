@@ -4,14 +4,28 @@ import json
 from decimal import Decimal
 from dateutil.relativedelta import relativedelta
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.response import TemplateResponse
 # Importação completa de TODOS os modelos necessários
-from .models import Lancamento, Categoria, CategoriaPadrao, Receita, Perfil, CartaoDeCredito
+from .models import Lancamento, Categoria, CategoriaPadrao, Receita, Perfil, CartaoDeCredito, Parcela
+from .meses import meses_por_ano, ameses_por_ano, intervalo_do_mes
+from .balanco import abalanco_do_periodo, projecao
+from .agregacoes import agastos_do_mes, adetalhes_do_mes, linhas_de_detalhe, AGRUPAMENTOS, FORMATOS
+from .versao import cache_por_versao, etag_por_versao, etag_assincrona_por_versao
+from .paginacao import pagina_por_chave, ler_cursor
+from . import busca, exportacao, importacao, metricas
+from .regras import classificador_do_usuario
+from .categorias import provisionar_categorias
+import codecs
 from django.contrib.auth.forms import UserCreationForm
 from django.urls import reverse_lazy
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponseBadRequest, Http404
+from django.db import transaction
 from django.db.models import Sum, Q, F, Func, IntegerField
-from django.db.models.functions import ExtractYear, ExtractMonth
+from django.db.models.functions import ExtractYear, ExtractMonth, TruncMonth
 from django.contrib import messages
 import locale 
 
@@ -23,115 +37,19 @@ except locale.Error:
     except locale.Error:
         print("Aviso: Locale 'pt_BR.utf8' ou 'Portuguese_Brazil.1252' não encontrado.")
 
-# --- FUNÇÃO AUXILIAR PARA CÁLCULO DE VENCIMENTO (ANTIGA/GLOBAL) ---
-def calcular_data_primeiro_vencimento(data_compra):
-    DIA_FECHAMENTO = 3
-    DIA_VENCIMENTO = 10
-    if isinstance(data_compra, datetime.datetime): data_compra_date = data_compra.date()
-    elif isinstance(data_compra, datetime.date): data_compra_date = data_compra
-    else:
-        try: data_compra_date = datetime.datetime.strptime(str(data_compra), '%Y-%m-%d').date()
-        except (ValueError, TypeError):
-             print(f"Alerta: Formato de data inesperado em calcular_data_primeiro_vencimento: {data_compra}")
-             hoje = datetime.date.today()
-             try: return (hoje + relativedelta(months=1)).replace(day=DIA_VENCIMENTO)
-             except ValueError: return (hoje + relativedelta(months=2)).replace(day=1) - relativedelta(days=1)
-             
-    if data_compra_date.day > DIA_FECHAMENTO:
-        vencimento_base = data_compra_date + relativedelta(months=1)
-    else:
-        vencimento_base = data_compra_date
-    try: vencimento = vencimento_base.replace(day=DIA_VENCIMENTO)
-    except ValueError:
-        primeiro_dia_mes_seguinte = vencimento_base.replace(day=1) + relativedelta(months=1)
-        vencimento = primeiro_dia_mes_seguinte - relativedelta(days=1)
-    return vencimento
-
-# --- NOVA FUNÇÃO AUXILIAR DE VENCIMENTO (POR CARTÃO) ---
-def calcular_vencimento_por_cartao(data_compra, cartao):
-    dia_fechamento = cartao.dia_fechamento
-    dia_vencimento = cartao.dia_vencimento
-    
-    if isinstance(data_compra, datetime.datetime): data_compra = data_compra.date()
-    elif not isinstance(data_compra, datetime.date):
-        try: data_compra = datetime.datetime.strptime(str(data_compra), '%Y-%m-%d').date()
-        except (ValueError, TypeError):
-             print(f"Alerta: Formato de data inesperado: {data_compra}")
-             return None 
-    
-    vencimento_base = data_compra
-    
-    if dia_vencimento < dia_fechamento:
-        if data_compra.day > dia_fechamento:
-            vencimento_base = data_compra + relativedelta(months=2)
-        else:
-            vencimento_base = data_compra + relativedelta(months=1)
-    else:
-        if data_compra.day > dia_fechamento:
-            vencimento_base = data_compra + relativedelta(months=1)
-        else:
-            vencimento_base = data_compra
-
-    try:
-        data_vencimento = vencimento_base.replace(day=dia_vencimento)
-    except ValueError: 
-        primeiro_dia_prox_mes = vencimento_base.replace(day=1) + relativedelta(months=1)
-        data_vencimento = primeiro_dia_prox_mes - relativedelta(days=1)
-
-    return data_vencimento
-
-
 # --- FUNÇÃO AUXILIAR PARA OBTER ANOS E MESES COM DADOS ---
-def get_anos_meses_disponiveis(user):
-    all_relevant_dates = set()
-    lancamentos_avista = Lancamento.objects.filter(user=user).exclude(metodo_pagamento='Crédito').values_list('data_compra', flat=True)
-    receitas_datas = Receita.objects.filter(user=user).values_list('data_recebimento', flat=True)
-    all_relevant_dates.update(lancamentos_avista)
-    all_relevant_dates.update(receitas_datas)
-    
-    cartoes_usuario = {cartao.id: cartao for cartao in CartaoDeCredito.objects.filter(user=user)}
-    lancamentos_credito = Lancamento.objects.filter(user=user, metodo_pagamento='Crédito')
-    
-    for lancamento in lancamentos_credito:
-        if lancamento.cartao_id in cartoes_usuario:
-            cartao = cartoes_usuario[lancamento.cartao_id]
-            primeiro_vencimento = calcular_vencimento_por_cartao(lancamento.data_compra, cartao)
-        else:
-            primeiro_vencimento = calcular_data_primeiro_vencimento(lancamento.data_compra)
-            
-        if primeiro_vencimento: 
-            for i in range(lancamento.num_parcelas or 1): 
-                data_vencimento_parcela = primeiro_vencimento + relativedelta(months=i)
-                all_relevant_dates.add(data_vencimento_parcela) 
-                
+def _mes_padrao(tem_dados):
     hoje = datetime.date.today()
     DIA_FECHAMENTO_GLOBAL = 3 
 
-    if not all_relevant_dates:
-        all_relevant_dates.add(hoje) 
-        ano_default = hoje.year
-        mes_default = hoje.month
-    else:
-        if hoje.day <= DIA_FECHAMENTO_GLOBAL:
-            ano_default = hoje.year
-            mes_default = hoje.month
-        else:
-            proximo_mes_data = hoje + relativedelta(months=1)
-            ano_default = proximo_mes_data.year
-            mes_default = proximo_mes_data.month
+    if not tem_dados or hoje.day <= DIA_FECHAMENTO_GLOBAL:
+        return hoje.year, hoje.month
+    proximo_mes_data = hoje + relativedelta(months=1)
+    return proximo_mes_data.year, proximo_mes_data.month
+
+def _com_mes_padrao(anos_meses):
+    ano_default, mes_default = _mes_padrao(bool(anos_meses))
 
-    sorted_dates = sorted([d for d in all_relevant_dates if isinstance(d, datetime.date)]) 
-    
-    if not sorted_dates:
-         sorted_dates = [hoje]
-
-    anos_meses = {}
-    for data in sorted_dates:
-        if data.year not in anos_meses:
-            anos_meses[data.year] = []
-        if data.month not in anos_meses[data.year]:
-            anos_meses[data.year].append(data.month)
-            
     if ano_default not in anos_meses:
         anos_meses[ano_default] = []
     if mes_default not in anos_meses[ano_default]:
@@ -149,7 +67,35 @@ def get_anos_meses_disponiveis(user):
 
     return anos_meses_ordenado, ano_default, mes_default
 
-# --- VIEW DA LISTA PRINCIPAL (FATURA MENSAL) ---
+def get_anos_meses_disponiveis(user):
+    # Os meses com dados vêm do índice MesDisponivel (mantido pelos sinais em models.py)
+    return _com_mes_padrao(meses_por_ano(user))
+
+async def aget_anos_meses_disponiveis(user):
+    return _com_mes_padrao(await ameses_por_ano(user))
+
+# --- APOIO ÀS VIEWS ASSÍNCRONAS ---
+# Dashboards, balanço e o lote de detalhes do mês são assíncronos. As consultas são
+# as mesmas das funções síncronas (meses.py, balanco.py, agregacoes.py), chamadas
+# com sync_to_async: o ORM assíncrono roda tudo numa thread só, então não há o que
+# ganhar separando-as em consultas paralelas.
+
+async def _usuario(request):
+    """ Carrega o usuário sem bloquear e o deixa em request.user para os templates. """
+    request.user = await request.auser()
+    return request.user
+
+def _mes_selecionado(request, anos_meses_disponiveis, ano_default, mes_default):
+    """ (ano, mes, meses_do_ano) válidos para o filtro, com as mesmas regras das outras telas. """
+    ano_selecionado = int(request.GET.get('ano', ano_default))
+    mes_selecionado = int(request.GET.get('mes', mes_default))
+    if ano_selecionado not in anos_meses_disponiveis:
+        ano_selecionado = ano_default
+    meses_do_ano_selecionado = anos_meses_disponiveis.get(ano_selecionado, [mes_default])
+    if mes_selecionado not in meses_do_ano_selecionado:
+        mes_selecionado = meses_do_ano_selecionado[0] if meses_do_ano_selecionado else mes_default
+    return ano_selecionado, mes_selecionado, meses_do_ano_selecionado
+
 @login_required
 def lista_lancamentos(request):
     user = request.user
@@ -169,6 +115,8 @@ def lista_lancamentos(request):
     if mes_selecionado not in meses_do_ano_selecionado:
         mes_selecionado = meses_do_ano_selecionado[0] if meses_do_ano_selecionado else mes_default
 
+    inicio_do_mes, fim_do_mes = intervalo_do_mes(ano_selecionado, mes_selecionado)
+
     filtro_local = request.GET.get('local', '')
     filtro_categoria_id = request.GET.get('categoria', '')
     filtro_descricao = request.GET.get('descricao', '') 
@@ -180,35 +128,23 @@ def lista_lancamentos(request):
     if filtro_cartao_id:
         try:
             cartao_selecionado = CartaoDeCredito.objects.get(id=filtro_cartao_id, user=user)
-            todos_lancamentos = Lancamento.objects.filter(user=user, cartao=cartao_selecionado)
-            
-            fatura_bruta = []
-            for lancamento in todos_lancamentos:
-                if lancamento.num_parcelas > 0: valor_parcela = lancamento.valor_total / lancamento.num_parcelas
-                else: valor_parcela = lancamento.valor_total
-                
-                primeiro_vencimento = calcular_vencimento_por_cartao(lancamento.data_compra, cartao_selecionado)
-                    
-                if primeiro_vencimento:
-                    for i in range(lancamento.num_parcelas or 1):
-                        data_vencimento_parcela = primeiro_vencimento + relativedelta(months=i)
-                        if data_vencimento_parcela.month == mes_selecionado and data_vencimento_parcela.year == ano_selecionado:
-                            item_fatura = {'original': lancamento, 'valor_parcela': valor_parcela, 'numero_parcela': f"{i + 1}/{lancamento.num_parcelas or 1}"}
-                            fatura_bruta.append(item_fatura)
-                            break
+            # Só as parcelas que vencem no mês; os filtros da tela também vão para a consulta
+            parcelas_do_mes = Parcela.objects.filter(
+                user=user, cartao=cartao_selecionado,
+                data_vencimento__gte=inicio_do_mes, data_vencimento__lt=fim_do_mes
+            )
+            if filtro_local:
+                parcelas_do_mes = parcelas_do_mes.filter(lancamento__local_compra__icontains=filtro_local)
+            if filtro_categoria_id:
+                parcelas_do_mes = parcelas_do_mes.filter(categoria_id=filtro_categoria_id)
+            if filtro_descricao:
+                parcelas_do_mes = parcelas_do_mes.filter(lancamento__descricao__icontains=filtro_descricao)
+            parcelas_do_mes = parcelas_do_mes.select_related('lancamento__categoria').order_by('lancamento__data_compra', 'lancamento_id')
             
-            for item in fatura_bruta:
-                if filtro_local and filtro_local.lower() not in item['original'].local_compra.lower():
-                    continue
-                if filtro_categoria_id and item['original'].categoria.id != int(filtro_categoria_id):
-                    continue
-                descricao_original = item['original'].descricao or "" 
-                if filtro_descricao and filtro_descricao.lower() not in descricao_original.lower():
-                     continue
-                lancamentos_do_mes.append(item)
-                total_fatura += item['valor_parcela']
-
-            lancamentos_do_mes.sort(key=lambda item: item['original'].data_compra)
+            for parcela in parcelas_do_mes:
+                lancamento = parcela.lancamento
+                lancamentos_do_mes.append({'original': lancamento, 'valor_parcela': parcela.valor, 'numero_parcela': f"{parcela.numero}/{lancamento.num_parcelas or 1}"})
+                total_fatura += parcela.valor
         
         except CartaoDeCredito.DoesNotExist:
             messages.error(request, "Cartão selecionado não foi encontrado.")
@@ -245,8 +181,34 @@ def lista_lancamentos(request):
     }
     return render(request, 'lancamentos/lista_lancamentos.html', context)
 
+# --- LISTAS PAGINADAS (EXTRATO E RECEITAS) ---
+# Mês a mês por padrão; com 'inicio' (e 'fim') em AAAA-MM a lista cobre o período
+# inteiro. Em ambos os casos anda em páginas pela chave (data, id), com os
+# cursores 'depois'/'antes', e o total sai de um Sum no banco.
+def _periodo_pedido(request):
+    """ (primeiro dia, dia seguinte ao fim) do período pedido em 'inicio'/'fim', ou None no modo mês a mês. """
+    if not request.GET.get('inicio'):
+        return None
+    try:
+        inicio = _ler_ano_mes(request.GET['inicio'])
+        fim = _ler_ano_mes(request.GET.get('fim') or request.GET['inicio'])
+    except ValueError:
+        return None
+    if fim < inicio:
+        inicio, fim = fim, inicio
+    return inicio, fim + relativedelta(months=1)
+
+def _contexto_da_pagina(request, queryset, campo_data, periodo):
+    pagina = pagina_por_chave(queryset, campo_data, depois=ler_cursor(request.GET.get('depois')), antes=ler_cursor(request.GET.get('antes')))
+    primeiro_dia, dia_seguinte_ao_fim = periodo
+    return {
+        'pagina': pagina,
+        'periodo': {'inicio': primeiro_dia.strftime('%Y-%m'), 'fim': (dia_seguinte_ao_fim - relativedelta(months=1)).strftime('%Y-%m')},
+    }
+
 # --- VIEW DO EXTRATO COMPLETO ---
 @login_required
+@cache_por_versao
 def extrato_completo(request):
     user = request.user
     anos_meses_disponiveis, ano_default, mes_default = get_anos_meses_disponiveis(user)
@@ -261,7 +223,9 @@ def extrato_completo(request):
     filtro_descricao = request.GET.get('descricao', '')
     filtro_categoria_id = request.GET.get('categoria', '')
     filtro_metodo = request.GET.get('metodo', '')
-    lancamentos_qs = Lancamento.objects.filter(user=user, data_compra__year=ano_selecionado, data_compra__month=mes_selecionado)
+    periodo_pedido = _periodo_pedido(request)
+    inicio, fim = periodo_pedido or intervalo_do_mes(ano_selecionado, mes_selecionado)
+    lancamentos_qs = Lancamento.objects.filter(user=user, data_compra__gte=inicio, data_compra__lt=fim)
     if filtro_local:
         lancamentos_qs = lancamentos_qs.filter(local_compra__icontains=filtro_local)
     if filtro_descricao:
@@ -270,14 +234,24 @@ def extrato_completo(request):
         lancamentos_qs = lancamentos_qs.filter(categoria_id=filtro_categoria_id)
     if filtro_metodo:
         lancamentos_qs = lancamentos_qs.filter(metodo_pagamento=filtro_metodo)
-    lancamentos = lancamentos_qs.order_by('data_compra')
-    total_gastos = sum(l.valor_total for l in lancamentos)
+    paginacao = _contexto_da_pagina(request, lancamentos_qs.select_related('categoria', 'cartao'), 'data_compra', (inicio, fim))
+    total_gastos = lancamentos_qs.aggregate(total=Sum('valor_total'))['total'] or Decimal('0.0')
     meses_nomes = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
     meses_para_filtro = {num: meses_nomes[num] for num in sorted(meses_do_ano_selecionado)}
     todas_categorias = Categoria.objects.filter(user=request.user).order_by('nome')
     todos_metodos = Lancamento.METODO_PAGAMENTO_CHOICES
-    context = {'lancamentos': lancamentos, 'total_gastos': total_gastos, 'anos': sorted(anos_meses_disponiveis.keys(), reverse=True), 'meses': meses_para_filtro.items(), 'mes_selecionado': mes_selecionado, 'ano_selecionado': ano_selecionado, 'mes_selecionado_nome': meses_nomes.get(mes_selecionado), 'todas_categorias': todas_categorias, 'todos_metodos': todos_metodos, 'filtros': {'local': filtro_local, 'descricao': filtro_descricao, 'categoria': int(filtro_categoria_id) if filtro_categoria_id else None, 'metodo': filtro_metodo}}
-    return render(request, 'lancamentos/extrato_completo.html', context)
+    context = {'lancamentos': paginacao['pagina']['itens'], **paginacao, 'modo_periodo': periodo_pedido is not None, 'total_gastos': total_gastos, 'anos': sorted(anos_meses_disponiveis.keys(), reverse=True), 'meses': list(meses_para_filtro.items()), 'mes_selecionado': mes_selecionado, 'ano_selecionado': ano_selecionado, 'mes_selecionado_nome': meses_nomes.get(mes_selecionado), 'todas_categorias': todas_categorias, 'todos_metodos': todos_metodos, 'filtros': {'local': filtro_local, 'descricao': filtro_descricao, 'categoria': int(filtro_categoria_id) if filtro_categoria_id else None, 'metodo': filtro_metodo}}
+    return TemplateResponse(request, 'lancamentos/extrato_completo.html', context)
+
+# --- BUSCA EM TODOS OS LANÇAMENTOS ---
+@login_required
+@cache_por_versao
+def buscar_lancamentos(request):
+    """ Busca por local e descrição em todo o histórico (FTS5), com os resultados por relevância. """
+    texto = request.GET.get('q', '').strip()
+    resultados = busca.buscar(request.user, texto) if texto else []
+    context = {'texto': texto, 'resultados': resultados, 'limite': busca.LIMITE_DE_RESULTADOS}
+    return TemplateResponse(request, 'lancamentos/busca.html', context)
 
 # --- CRUD de Lançamentos ---
 @login_required
@@ -297,6 +271,12 @@ def novo_lancamento(request):
             parcelas = int(parcelas_str) if parcelas_str else 1
             if parcelas < 1: parcelas = 1
         except ValueError: parcelas = 1
+        if metodo_pagamento == 'Crédito' and parcelas > Lancamento.MAX_PARCELAS:
+            messages.error(request, f'O número de parcelas deve ficar entre 1 e {Lancamento.MAX_PARCELAS}.')
+            categorias = Categoria.objects.filter(user=user)
+            cartoes = CartaoDeCredito.objects.filter(user=user)
+            context = {'categorias': categorias, 'cartoes': cartoes, 'form_data': request.POST, 'max_parcelas': Lancamento.MAX_PARCELAS}
+            return render(request, 'lancamentos/novo_lancamento.html', context)
         
         cartao_obj = None
         if metodo_pagamento == 'Crédito':
@@ -304,7 +284,7 @@ def novo_lancamento(request):
                 messages.error(request, 'Para pagamentos no Crédito, você deve selecionar um cartão.')
                 categorias = Categoria.objects.filter(user=user)
                 cartoes = CartaoDeCredito.objects.filter(user=user)
-                context = {'categorias': categorias, 'cartoes': cartoes, 'form_data': request.POST}
+                context = {'categorias': categorias, 'cartoes': cartoes, 'form_data': request.POST, 'max_parcelas': Lancamento.MAX_PARCELAS}
                 return render(request, 'lancamentos/novo_lancamento.html', context)
             try:
                 cartao_obj = CartaoDeCredito.objects.get(id=cartao_id, user=user)
@@ -312,23 +292,25 @@ def novo_lancamento(request):
                 messages.error(request, 'Cartão de crédito selecionado é inválido.')
                 categorias = Categoria.objects.filter(user=user)
                 cartoes = CartaoDeCredito.objects.filter(user=user)
-                context = {'categorias': categorias, 'cartoes': cartoes, 'form_data': request.POST}
+                context = {'categorias': categorias, 'cartoes': cartoes, 'form_data': request.POST, 'max_parcelas': Lancamento.MAX_PARCELAS}
                 return render(request, 'lancamentos/novo_lancamento.html', context)
             
         if metodo_pagamento != 'Crédito':
             parcelas = 1
 
-        Lancamento.objects.create(
-            local_compra=local, 
-            descricao=descricao, 
-            data_compra=data, 
-            valor_total=valor, 
-            num_parcelas=parcelas, 
-            categoria_id=categoria_id, 
-            metodo_pagamento=metodo_pagamento, 
-            cartao=cartao_obj, 
-            user=user
-        )
+        # O lançamento, as parcelas, o índice de meses e a versão (sinais) numa única transação
+        with transaction.atomic():
+            Lancamento.objects.create(
+                local_compra=local, 
+                descricao=descricao, 
+                data_compra=data, 
+                valor_total=valor, 
+                num_parcelas=parcelas, 
+                categoria_id=categoria_id, 
+                metodo_pagamento=metodo_pagamento, 
+                cartao=cartao_obj, 
+                user=user
+            )
         messages.success(request, 'Lançamento adicionado com sucesso!')
         next_url = request.POST.get('next', 'fatura_cartao')
         if 'extrato' in next_url:
@@ -337,7 +319,7 @@ def novo_lancamento(request):
     else:
         categorias = Categoria.objects.filter(user=user)
         cartoes = CartaoDeCredito.objects.filter(user=user) 
-        context = {'categorias': categorias, 'cartoes': cartoes} 
+        context = {'categorias': categorias, 'cartoes': cartoes, 'max_parcelas': Lancamento.MAX_PARCELAS}
         context['next_page'] = request.META.get('HTTP_REFERER', 'fatura_cartao')
         return render(request, 'lancamentos/novo_lancamento.html', context)
 
@@ -360,6 +342,12 @@ def editar_lancamento(request, pk):
             if parcelas < 1: parcelas = 1
         except ValueError: parcelas = 1 
         lancamento.num_parcelas = parcelas
+        if lancamento.metodo_pagamento == 'Crédito' and parcelas > Lancamento.MAX_PARCELAS:
+            messages.error(request, f'O número de parcelas deve ficar entre 1 e {Lancamento.MAX_PARCELAS}.')
+            categorias = Categoria.objects.filter(user=user)
+            cartoes = CartaoDeCredito.objects.filter(user=user)
+            context = {'lancamento': lancamento, 'categorias': categorias, 'cartoes': cartoes, 'max_parcelas': Lancamento.MAX_PARCELAS}
+            return render(request, 'lancamentos/novo_lancamento.html', context)
 
         if lancamento.metodo_pagamento != 'Crédito':
             lancamento.num_parcelas = 1
@@ -370,7 +358,7 @@ def editar_lancamento(request, pk):
                 messages.error(request, 'Para pagamentos no Crédito, você deve selecionar um cartão.')
                 categorias = Categoria.objects.filter(user=user)
                 cartoes = CartaoDeCredito.objects.filter(user=user)
-                context = {'lancamento': lancamento, 'categorias': categorias, 'cartoes': cartoes}
+                context = {'lancamento': lancamento, 'categorias': categorias, 'cartoes': cartoes, 'max_parcelas': Lancamento.MAX_PARCELAS}
                 return render(request, 'lancamentos/novo_lancamento.html', context)
             if cartao_id:
                 try:
@@ -379,11 +367,12 @@ def editar_lancamento(request, pk):
                     messages.error(request, 'Cartão de crédito selecionado é inválido.')
                     categorias = Categoria.objects.filter(user=user)
                     cartoes = CartaoDeCredito.objects.filter(user=user)
-                    context = {'lancamento': lancamento, 'categorias': categorias, 'cartoes': cartoes}
+                    context = {'lancamento': lancamento, 'categorias': categorias, 'cartoes': cartoes, 'max_parcelas': Lancamento.MAX_PARCELAS}
                     return render(request, 'lancamentos/novo_lancamento.html', context)
             lancamento.cartao = cartao_obj 
 
-        lancamento.save()
+        with transaction.atomic():
+            lancamento.save()
         messages.success(request, 'Lançamento atualizado com sucesso!')
         next_url = request.POST.get('next', 'fatura_cartao')
         if 'extrato' in next_url:
@@ -392,7 +381,7 @@ def editar_lancamento(request, pk):
     else:
         categorias = Categoria.objects.filter(user=user)
         cartoes = CartaoDeCredito.objects.filter(user=user)
-        context = {'lancamento': lancamento, 'categorias': categorias, 'cartoes': cartoes}
+        context = {'lancamento': lancamento, 'categorias': categorias, 'cartoes': cartoes, 'max_parcelas': Lancamento.MAX_PARCELAS}
         context['next_page'] = request.META.get('HTTP_REFERER', 'fatura_cartao')
         return render(request, 'lancamentos/novo_lancamento.html', context)
 
@@ -425,11 +414,14 @@ def lista_receitas(request):
     meses_do_ano_selecionado = anos_meses_disponiveis.get(ano_selecionado, [mes_default])
     if mes_selecionado not in meses_do_ano_selecionado:
         mes_selecionado = meses_do_ano_selecionado[0] if meses_do_ano_selecionado else mes_default
-    receitas = Receita.objects.filter(user=user, data_recebimento__year=ano_selecionado, data_recebimento__month=mes_selecionado).order_by('data_recebimento')
-    total_receitas = sum(r.valor for r in receitas) if receitas else Decimal('0.0')
+    periodo_pedido = _periodo_pedido(request)
+    inicio, fim = periodo_pedido or intervalo_do_mes(ano_selecionado, mes_selecionado)
+    receitas_qs = Receita.objects.filter(user=user, data_recebimento__gte=inicio, data_recebimento__lt=fim)
+    paginacao = _contexto_da_pagina(request, receitas_qs, 'data_recebimento', (inicio, fim))
+    total_receitas = receitas_qs.aggregate(total=Sum('valor'))['total'] or Decimal('0.0')
     meses_nomes = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
     meses_para_filtro = {num: meses_nomes[num] for num in sorted(meses_do_ano_selecionado)}
-    context = {'receitas': receitas, 'total_receitas': total_receitas, 'anos': sorted(anos_meses_disponiveis.keys(), reverse=True), 'meses': meses_para_filtro.items(), 'mes_selecionado': mes_selecionado, 'ano_selecionado': ano_selecionado, 'mes_selecionado_nome': meses_nomes.get(mes_selecionado)}
+    context = {'receitas': paginacao['pagina']['itens'], **paginacao, 'modo_periodo': periodo_pedido is not None, 'total_receitas': total_receitas, 'anos': sorted(anos_meses_disponiveis.keys(), reverse=True), 'meses': meses_para_filtro.items(), 'mes_selecionado': mes_selecionado, 'ano_selecionado': ano_selecionado, 'mes_selecionado_nome': meses_nomes.get(mes_selecionado)}
     return render(request, 'lancamentos/lista_receitas.html', context)
 
 @login_required
@@ -477,9 +469,7 @@ def registrar(request):
         if form.is_valid():
             novo_usuario = form.save()
             # Perfil.objects.create(user=novo_usuario) # Sinal cuida disso
-            categorias_padrao = CategoriaPadrao.objects.all()
-            for cat_padrao in categorias_padrao:
-                Categoria.objects.create(nome=cat_padrao.nome, macro_categoria=cat_padrao.macro_categoria, exemplos=cat_padrao.exemplos, user=novo_usuario)
+            provisionar_categorias([novo_usuario.pk])
             return redirect('login') 
     else:
         form = UserCreationForm()
@@ -487,202 +477,262 @@ def registrar(request):
     return render(request, 'registration/registrar.html', context)
 
 # --- DASHBOARDS ---
-@login_required
-def dashboard(request):
-    user = request.user
-    anos_meses_disponiveis, ano_default, mes_default = get_anos_meses_disponiveis(user)
-    ano_selecionado = int(request.GET.get('ano', ano_default))
-    mes_selecionado = int(request.GET.get('mes', mes_default))
+# Os dois dashboards só mudam o agrupamento; os totais vêm de lancamentos/agregacoes.py
+async def _dashboard(request, agrupamento, template):
+    user = await _usuario(request)
     metodos_selecionados = request.GET.getlist('metodos')
-    if ano_selecionado not in anos_meses_disponiveis:
-        ano_selecionado = ano_default
-    meses_do_ano_selecionado = anos_meses_disponiveis.get(ano_selecionado, [mes_default])
-    if mes_selecionado not in meses_do_ano_selecionado:
-        mes_selecionado = meses_do_ano_selecionado[0] if meses_do_ano_selecionado else mes_default
     if not metodos_selecionados:
         metodos_considerados = ['Crédito', 'Débito', 'PIX', 'Dinheiro']
     else:
         metodos_considerados = metodos_selecionados
-    gastos_agrupados = {}
-    metodos_avista = [m for m in metodos_considerados if m != 'Crédito']
-    if metodos_avista:
-        gastos_avista = Lancamento.objects.filter(user=user, data_compra__year=ano_selecionado, data_compra__month=mes_selecionado, metodo_pagamento__in=metodos_avista).values('categoria__nome').annotate(total=Sum('valor_total'))
-        for item in gastos_avista:
-            gastos_agrupados[item['categoria__nome']] = Decimal(item['total'] or '0.0') 
-    if 'Crédito' in metodos_considerados:
-        lancamentos_credito = Lancamento.objects.filter(user=user, metodo_pagamento='Crédito', cartao__isnull=False).select_related('cartao', 'categoria')
-        for lancamento in lancamentos_credito:
-            if lancamento.num_parcelas > 0: valor_parcela = lancamento.valor_total / lancamento.num_parcelas
-            else: valor_parcela = lancamento.valor_total
-            primeiro_vencimento = calcular_vencimento_por_cartao(lancamento.data_compra, lancamento.cartao)
-            if primeiro_vencimento:
-                for i in range(lancamento.num_parcelas or 1):
-                    data_vencimento_parcela = primeiro_vencimento + relativedelta(months=i)
-                    if data_vencimento_parcela.month == mes_selecionado and data_vencimento_parcela.year == ano_selecionado:
-                        categoria_nome = lancamento.categoria.nome
-                        gastos_agrupados[categoria_nome] = gastos_agrupados.get(categoria_nome, Decimal('0.0')) + valor_parcela
-                        break
+    anos_meses_disponiveis, ano_default, mes_default = await aget_anos_meses_disponiveis(user)
+    ano_selecionado, mes_selecionado, meses_do_ano_selecionado = _mes_selecionado(request, anos_meses_disponiveis, ano_default, mes_default)
+    gastos_agrupados = (await agastos_do_mes(user, ano_selecionado, mes_selecionado, metodos_considerados))[agrupamento]
     labels = list(gastos_agrupados.keys())
     data = [float(valor) for valor in gastos_agrupados.values()]
     meses_nomes = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
     meses_para_filtro = {num: meses_nomes[num] for num in sorted(meses_do_ano_selecionado)}
-    context = {'labels': json.dumps(labels), 'data': json.dumps(data), 'anos': sorted(anos_meses_disponiveis.keys(), reverse=True), 'meses': meses_para_filtro.items(), 'mes_selecionado': mes_selecionado, 'ano_selecionado': ano_selecionado, 'mes_selecionado_nome': meses_nomes.get(mes_selecionado), 'metodos_selecionados': metodos_considerados}
-    return render(request, 'lancamentos/dashboard.html', context)
+    context = {'labels': json.dumps(labels), 'data': json.dumps(data), 'anos': sorted(anos_meses_disponiveis.keys(), reverse=True), 'meses': list(meses_para_filtro.items()), 'mes_selecionado': mes_selecionado, 'ano_selecionado': ano_selecionado, 'mes_selecionado_nome': meses_nomes.get(mes_selecionado), 'metodos_selecionados': metodos_considerados}
+    return TemplateResponse(request, template, context)
 
 @login_required
-def dashboard_macro(request):
-    user = request.user
-    anos_meses_disponiveis, ano_default, mes_default = get_anos_meses_disponiveis(user)
-    ano_selecionado = int(request.GET.get('ano', ano_default))
-    mes_selecionado = int(request.GET.get('mes', mes_default))
-    metodos_selecionados = request.GET.getlist('metodos')
-    if ano_selecionado not in anos_meses_disponiveis:
-        ano_selecionado = ano_default
-    meses_do_ano_selecionado = anos_meses_disponiveis.get(ano_selecionado, [mes_default])
-    if mes_selecionado not in meses_do_ano_selecionado:
-        mes_selecionado = meses_do_ano_selecionado[0] if meses_do_ano_selecionado else mes_default
-    if not metodos_selecionados:
-        metodos_considerados = ['Crédito', 'Débito', 'PIX', 'Dinheiro']
-    else:
-        metodos_considerados = metodos_selecionados
-    gastos_agrupados = {}
-    metodos_avista = [m for m in metodos_considerados if m != 'Crédito']
-    if metodos_avista:
-        gastos_avista = Lancamento.objects.filter(user=user, data_compra__year=ano_selecionado, data_compra__month=mes_selecionado, metodo_pagamento__in=metodos_avista).values('categoria__macro_categoria').annotate(total=Sum('valor_total'))
-        for item in gastos_avista:
-            gastos_agrupados[item['categoria__macro_categoria']] = Decimal(item['total'] or '0.0')
-    if 'Crédito' in metodos_considerados:
-        lancamentos_credito = Lancamento.objects.filter(user=user, metodo_pagamento='Crédito', cartao__isnull=False).select_related('cartao', 'categoria')
-        for lancamento in lancamentos_credito:
-            if lancamento.num_parcelas > 0: valor_parcela = lancamento.valor_total / lancamento.num_parcelas
-            else: valor_parcela = lancamento.valor_total
-            primeiro_vencimento = calcular_vencimento_por_cartao(lancamento.data_compra, lancamento.cartao)
-            if primeiro_vencimento:
-                for i in range(lancamento.num_parcelas or 1):
-                    data_vencimento_parcela = primeiro_vencimento + relativedelta(months=i)
-                    if data_vencimento_parcela.month == mes_selecionado and data_vencimento_parcela.year == ano_selecionado:
-                        macro_nome = lancamento.categoria.macro_categoria
-                        gastos_agrupados[macro_nome] = gastos_agrupados.get(macro_nome, Decimal('0.0')) + valor_parcela
-                        break
-    labels = list(gastos_agrupados.keys())
-    data = [float(valor) for valor in gastos_agrupados.values()]
-    meses_nomes = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
-    meses_para_filtro = {num: meses_nomes[num] for num in sorted(meses_do_ano_selecionado)}
-    context = {'labels': json.dumps(labels), 'data': json.dumps(data), 'anos': sorted(anos_meses_disponiveis.keys(), reverse=True), 'meses': meses_para_filtro.items(), 'mes_selecionado': mes_selecionado, 'ano_selecionado': ano_selecionado, 'mes_selecionado_nome': meses_nomes.get(mes_selecionado), 'metodos_selecionados': metodos_considerados}
-    return render(request, 'lancamentos/dashboard_macro.html', context)
+@cache_por_versao
+async def dashboard(request):
+    return await _dashboard(request, 'categoria', 'lancamentos/dashboard.html')
+
+@login_required
+@cache_por_versao
+async def dashboard_macro(request):
+    return await _dashboard(request, 'macro_categoria', 'lancamentos/dashboard_macro.html')
 
 # --- APIs ---
+# Linhas de detalhe enviadas aos poucos: o JSON é montado em blocos enquanto as linhas chegam do banco
+TAMANHO_BLOCO_JSON = 200
+
+def _lancamentos_em_json(linhas):
+    yield '{"lancamentos": ['
+    bloco = []
+    primeira = True
+    for _, linha in linhas:
+        bloco.append(json.dumps(linha))
+        if len(bloco) >= TAMANHO_BLOCO_JSON:
+            yield ('' if primeira else ',') + ','.join(bloco)
+            primeira, bloco = False, []
+    if bloco:
+        yield ('' if primeira else ',') + ','.join(bloco)
+    yield ']}'
+
+def _parametros_de_detalhe(request):
+    """ (ano, mes, metodos, formato) da query string; levanta ValueError se algo for inválido. """
+    try:
+        mes = int(request.GET.get('mes'))
+        ano = int(request.GET.get('ano'))
+        datetime.date(ano, mes, 1)
+    except (TypeError, ValueError):
+        raise ValueError('Informe ano e mes válidos.')
+    formato = request.GET.get('formato', 'iso')
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato inválido. Use: {", ".join(FORMATOS)}.')
+    metodos_query = request.GET.get('metodos', '')
+    metodos = metodos_query.split(',') if metodos_query else ['Crédito', 'Débito', 'PIX', 'Dinheiro']
+    return ano, mes, metodos, formato
+
+# O navegador sempre revalida (no-cache) e recebe 304 enquanto a versão dos dados não mudar.
+# As duas APIs por categoria continuam síncronas: no WSGI o StreamingHttpResponse só
+# envia aos poucos um iterador síncrono (.iterator() nas duas consultas de detalhe).
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_por_versao)
 def api_detalhes_categoria(request):
-    user = request.user
-    mes = int(request.GET.get('mes'))
-    ano = int(request.GET.get('ano'))
-    categoria_nome = request.GET.get('categoria')
-    metodos_query = request.GET.get('metodos', '') 
-    metodos = metodos_query.split(',') if metodos_query else ['Crédito', 'Débito', 'PIX', 'Dinheiro']
     try:
-        categoria = Categoria.objects.get(user=user, nome=categoria_nome)
+        ano, mes, metodos, formato = _parametros_de_detalhe(request)
+    except ValueError as erro:
+        return JsonResponse({'error': str(erro)}, status=400)
+    try:
+        categoria = Categoria.objects.get(user=request.user, nome=request.GET.get('categoria'))
     except Categoria.DoesNotExist:
         return JsonResponse({'error': 'Categoria não encontrada'}, status=404)
-    detalhes_lancamentos = []
-    metodos_avista = [m for m in metodos if m != 'Crédito']
-    if metodos_avista:
-        lancamentos_avista = Lancamento.objects.filter(user=user, categoria=categoria, data_compra__year=ano, data_compra__month=mes, metodo_pagamento__in=metodos_avista)
-        for lancamento in lancamentos_avista:
-             detalhes_lancamentos.append({'local': lancamento.local_compra, 'data_compra': lancamento.data_compra.strftime('%d/%m/%Y'), 'descricao': lancamento.descricao, 'valor_total': f'{lancamento.valor_total:.2f}'.replace('.', ',')})
-    if 'Crédito' in metodos:
-        lancamentos_credito = Lancamento.objects.filter(user=user, categoria=categoria, metodo_pagamento='Crédito', cartao__isnull=False).select_related('cartao')
-        for lancamento in lancamentos_credito:
-            if lancamento.num_parcelas > 0: valor_parcela = lancamento.valor_total / lancamento.num_parcelas
-            else: valor_parcela = lancamento.valor_total
-            primeiro_vencimento = calcular_vencimento_por_cartao(lancamento.data_compra, lancamento.cartao)
-            if primeiro_vencimento:
-                for i in range(lancamento.num_parcelas or 1):
-                    data_vencimento_parcela = primeiro_vencimento + relativedelta(months=i)
-                    if data_vencimento_parcela.month == mes and data_vencimento_parcela.year == ano:
-                        detalhes_lancamentos.append({'local': lancamento.local_compra, 'data_compra': lancamento.data_compra.strftime('%d/%m/%Y'), 'descricao': lancamento.descricao, 'valor_parcela': f'{valor_parcela:.2f}'.replace('.', ',')})
-                        break
-    detalhes_lancamentos.sort(key=lambda x: datetime.datetime.strptime(x['data_compra'], '%d/%m/%Y').date())
-    return JsonResponse({'lancamentos': detalhes_lancamentos})
+    linhas = linhas_de_detalhe(request.user, ano, mes, metodos, formato, categoria=categoria)
+    return StreamingHttpResponse(_lancamentos_em_json(linhas), content_type='application/json')
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_por_versao)
 def api_detalhes_macro_categoria(request):
+    try:
+        ano, mes, metodos, formato = _parametros_de_detalhe(request)
+    except ValueError as erro:
+        return JsonResponse({'error': str(erro)}, status=400)
+    linhas = linhas_de_detalhe(request.user, ano, mes, metodos, formato, categoria__macro_categoria=request.GET.get('macro_categoria'))
+    return StreamingHttpResponse(_lancamentos_em_json(linhas), content_type='application/json')
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@etag_assincrona_por_versao
+async def api_detalhes_mes(request):
+    """ Detalhes de todas as categorias (ou macro categorias) do mês de uma vez, para o dashboard pré-carregar. """
+    user = await _usuario(request)
+    try:
+        ano, mes, metodos, formato = _parametros_de_detalhe(request)
+    except ValueError as erro:
+        return JsonResponse({'error': str(erro)}, status=400)
+    agrupamento = request.GET.get('agrupamento', 'categoria')
+    if agrupamento not in AGRUPAMENTOS:
+        return JsonResponse({'error': f'Agrupamento inválido. Use: {", ".join(AGRUPAMENTOS)}.'}, status=400)
+    return JsonResponse({'agrupamento': agrupamento, 'detalhes': await adetalhes_do_mes(user, ano, mes, metodos, agrupamento, formato)})
+
+@login_required
+def api_sugerir_categoria(request):
+    """ Categoria sugerida pelas regras do usuário para um local/descrição (usada no formulário de lançamento). """
+    categoria_id = classificador_do_usuario(request.user.pk).classificar(request.GET.get('local', ''), request.GET.get('descricao', ''))
+    return JsonResponse({'categoria_id': categoria_id})
+
+MAX_MESES_PROJECAO = 120
+
+def _ler_ano_mes(texto):
+    """ Converte 'AAAA-MM' em date (dia 1). """
+    ano, mes = texto.split('-')
+    return datetime.date(int(ano), int(mes), 1)
+
+@login_required
+def api_projecao(request):
+    """ Projeção do fluxo de caixa (receitas, à vista e fatura de cada cartão) de 'inicio' a 'fim' (AAAA-MM). """
     user = request.user
-    mes = int(request.GET.get('mes'))
-    ano = int(request.GET.get('ano'))
-    macro_categoria_nome = request.GET.get('macro_categoria')
-    metodos_query = request.GET.get('metodos', '')
-    metodos = metodos_query.split(',') if metodos_query else ['Crédito', 'Débito', 'PIX', 'Dinheiro']
-    detalhes_lancamentos = []
-    metodos_avista = [m for m in metodos if m != 'Crédito']
-    if metodos_avista:
-         lancamentos_avista = Lancamento.objects.filter(user=user, categoria__macro_categoria=macro_categoria_nome, data_compra__year=ano, data_compra__month=mes, metodo_pagamento__in=metodos_avista)
-         for lancamento in lancamentos_avista:
-             detalhes_lancamentos.append({'local': lancamento.local_compra, 'data_compra': lancamento.data_compra.strftime('%d/%m/%Y'), 'descricao': lancamento.descricao, 'valor_total': f'{lancamento.valor_total:.2f}'.replace('.', ',')})
-    if 'Crédito' in metodos:
-        lancamentos_credito = Lancamento.objects.filter(user=user, categoria__macro_categoria=macro_categoria_nome, metodo_pagamento='Crédito', cartao__isnull=False).select_related('cartao')
-        for lancamento in lancamentos_credito:
-            if lancamento.num_parcelas > 0: valor_parcela = lancamento.valor_total / lancamento.num_parcelas
-            else: valor_parcela = lancamento.valor_total
-            primeiro_vencimento = calcular_vencimento_por_cartao(lancamento.data_compra, lancamento.cartao)
-            if primeiro_vencimento:
-                for i in range(lancamento.num_parcelas or 1):
-                    data_vencimento_parcela = primeiro_vencimento + relativedelta(months=i)
-                    if data_vencimento_parcela.month == mes and data_vencimento_parcela.year == ano:
-                        detalhes_lancamentos.append({'local': lancamento.local_compra, 'data_compra': lancamento.data_compra.strftime('%d/%m/%Y'), 'descricao': lancamento.descricao, 'valor_parcela': f'{valor_parcela:.2f}'.replace('.', ',')})
-                        break
-    detalhes_lancamentos.sort(key=lambda x: datetime.datetime.strptime(x['data_compra'], '%d/%m/%Y').date())
-    return JsonResponse({'lancamentos': detalhes_lancamentos})
+    hoje = datetime.date.today().replace(day=1)
+    try:
+        inicio = _ler_ano_mes(request.GET['inicio']) if request.GET.get('inicio') else hoje
+        fim = _ler_ano_mes(request.GET['fim']) if request.GET.get('fim') else inicio + relativedelta(months=11)
+    except ValueError:
+        return JsonResponse({'error': 'Use o formato AAAA-MM em inicio e fim.'}, status=400)
+    if fim < inicio:
+        return JsonResponse({'error': 'O fim deve ser igual ou posterior ao início.'}, status=400)
+    if (fim.year - inicio.year) * 12 + fim.month - inicio.month >= MAX_MESES_PROJECAO:
+        return JsonResponse({'error': f'O período máximo é de {MAX_MESES_PROJECAO} meses.'}, status=400)
+
+    cartoes = list(CartaoDeCredito.objects.filter(user=user).values('id', 'nome'))
+    meses = []
+    for linha in projecao(user, inicio, fim):
+        meses.append({
+            'mes': f"{linha['ano']}-{linha['mes']:02d}",
+            'receitas': f"{linha['receitas']:.2f}",
+            'avista': f"{linha['avista']:.2f}",
+            'faturas': {str(cartao_id): f'{total:.2f}' for cartao_id, total in linha['faturas_por_cartao'].items()},
+            'total_faturas': f"{linha['total_faturas']:.2f}",
+            'saldo': f"{linha['saldo']:.2f}",
+        })
+    return JsonResponse({'inicio': inicio.strftime('%Y-%m'), 'fim': fim.strftime('%Y-%m'), 'cartoes': cartoes, 'meses': meses})
+
+# --- EXPORTAÇÃO (CSV / OFX) ---
+def _ler_data_de_exportacao(texto, fim_do_mes=False):
+    """ Aceita 'AAAA-MM-DD' ou 'AAAA-MM' (o mês inteiro: dia 1 no início, último dia no fim). """
+    if len(texto) == 10:
+        return datetime.date.fromisoformat(texto)
+    data = _ler_ano_mes(texto)
+    return data + relativedelta(months=1, days=-1) if fim_do_mes else data
 
-# --- VIEW DO BALANÇO MENSAL (ATUALIZADA) ---
 @login_required
-def balanco_mensal(request):
+def exportar(request, tipo):
+    """ Extrato, faturas ou receitas de 'inicio' a 'fim' em CSV ou OFX, enviados em streaming. """
+    if tipo not in exportacao.TIPOS:
+        raise Http404
+    formato = request.GET.get('formato', 'csv')
+    if formato not in exportacao.FORMATOS:
+        return HttpResponseBadRequest(f'Formato inválido. Use: {", ".join(exportacao.FORMATOS)}.')
+    mes_atual = datetime.date.today().strftime('%Y-%m')
+    try:
+        inicio = _ler_data_de_exportacao(request.GET.get('inicio') or mes_atual)
+        fim = _ler_data_de_exportacao(request.GET.get('fim') or request.GET.get('inicio') or mes_atual, fim_do_mes=True)
+        cartao_id = int(request.GET['cartao_id']) if request.GET.get('cartao_id') else None
+    except ValueError:
+        return HttpResponseBadRequest('Use AAAA-MM-DD ou AAAA-MM em inicio e fim.')
+    if fim < inicio:
+        return HttpResponseBadRequest('O fim deve ser igual ou posterior ao início.')
+    if cartao_id and not CartaoDeCredito.objects.filter(pk=cartao_id, user=request.user).exists():
+        raise Http404
+
+    gerar = exportacao.gerar_csv if formato == 'csv' else exportacao.gerar_ofx
+    tipo_conteudo = 'text/csv; charset=utf-8' if formato == 'csv' else 'application/x-ofx; charset=utf-8'
+    resposta = StreamingHttpResponse(gerar(tipo, request.user, inicio, fim, cartao_id), content_type=tipo_conteudo)
+    resposta['Content-Disposition'] = f'attachment; filename="{tipo}_{inicio:%Y%m%d}_{fim:%Y%m%d}.{formato}"'
+    return resposta
+
+# --- IMPORTAÇÃO (CSV / OFX) ---
+# Quantos erros de linha aparecem na mensagem (o resto é só contado)
+MAX_ERROS_EXIBIDOS = 5
+
+@login_required
+def importar_extrato(request):
     user = request.user
-    anos_meses_disponiveis, ano_default, mes_default = get_anos_meses_disponiveis(user)
-    ano_selecionado = int(request.GET.get('ano', ano_default))
-    mes_selecionado = int(request.GET.get('mes', mes_default))
-    if ano_selecionado not in anos_meses_disponiveis:
-        ano_selecionado = ano_default
-    meses_do_ano_selecionado = anos_meses_disponiveis.get(ano_selecionado, [mes_default])
-    if mes_selecionado not in meses_do_ano_selecionado:
-        mes_selecionado = meses_do_ano_selecionado[0] if meses_do_ano_selecionado else mes_default
-    receitas_mes = Receita.objects.filter(user=user, data_recebimento__year=ano_selecionado, data_recebimento__month=mes_selecionado)
-    total_receitas = sum(r.valor for r in receitas_mes) if receitas_mes else Decimal('0.0')
-    
-    # MUDANÇA: Lógica de faturas agora soma TODAS as faturas de TODOS os cartões que vencem no mês
-    lancamentos_credito = Lancamento.objects.filter(user=user, metodo_pagamento='Crédito', cartao__isnull=False).select_related('cartao')
-    total_fatura_mes = Decimal('0.0')
-    for lancamento in lancamentos_credito:
-        if lancamento.num_parcelas > 0: valor_parcela = lancamento.valor_total / lancamento.num_parcelas
-        else: valor_parcela = lancamento.valor_total
-        
-        primeiro_vencimento = calcular_vencimento_por_cartao(lancamento.data_compra, lancamento.cartao)
-        
-        if primeiro_vencimento:
-            for i in range(lancamento.num_parcelas or 1):
-                data_vencimento_parcela = primeiro_vencimento + relativedelta(months=i)
-                if data_vencimento_parcela.month == mes_selecionado and data_vencimento_parcela.year == ano_selecionado:
-                    total_fatura_mes += valor_parcela
-                    break
-                    
-    despesas_avista = Lancamento.objects.filter(user=user, data_compra__year=ano_selecionado, data_compra__month=mes_selecionado).exclude(metodo_pagamento='Crédito')
-    total_despesas_avista = sum(d.valor_total for d in despesas_avista) if despesas_avista else Decimal('0.0')
-    total_despesas = total_fatura_mes + total_despesas_avista
-    saldo = total_receitas - total_despesas
+    categorias = Categoria.objects.filter(user=user).order_by('nome')
+    cartoes = CartaoDeCredito.objects.filter(user=user)
+    context = {'categorias': categorias, 'cartoes': cartoes, 'metodos': Lancamento.METODO_PAGAMENTO_CHOICES, 'form_data': request.POST}
+    if request.method != 'POST':
+        return render(request, 'lancamentos/importar.html', context)
+
+    arquivo = request.FILES.get('arquivo')
+    if not arquivo:
+        messages.error(request, 'Selecione um arquivo CSV ou OFX.')
+        return render(request, 'lancamentos/importar.html', context)
+    formato = 'ofx' if arquivo.name.lower().endswith('.ofx') else 'csv'
+    categoria_padrao = categorias.filter(pk=request.POST.get('categoria')).first() if request.POST.get('categoria') else None
+    cartao_padrao = cartoes.filter(pk=request.POST.get('cartao')).first() if request.POST.get('cartao') else None
+    metodo_padrao = request.POST.get('metodo') or 'Crédito'
+
+    # O arquivo é lido linha a linha, sem carregar tudo na memória
+    linhas = codecs.iterdecode(arquivo, 'utf-8-sig', errors='replace')
+    try:
+        resultado = importacao.importar(user, linhas, formato, categoria_padrao, cartao_padrao, metodo_padrao)
+    except importacao.ErroDeImportacao as erro:
+        messages.error(request, f'Não foi possível importar o arquivo: {erro}')
+        return render(request, 'lancamentos/importar.html', context)
+
+    messages.success(request, f"{resultado['importados']} lançamento(s) importado(s); {resultado['duplicados']} repetido(s) e {resultado['ignorados']} crédito(s) ignorado(s).")
+    if resultado['erros']:
+        exibidos = '; '.join(f'linha {numero}: {mensagem}' for numero, mensagem in resultado['erros'][:MAX_ERROS_EXIBIDOS])
+        restantes = len(resultado['erros']) - MAX_ERROS_EXIBIDOS
+        messages.warning(request, f"{len(resultado['erros'])} linha(s) com erro — {exibidos}" + (f' (e mais {restantes})' if restantes > 0 else ''))
+    return redirect('extrato_completo')
+
+# --- VIEW DO BALANÇO MENSAL (ATUALIZADA) ---
+OPCOES_PERIODO = [(1, 'Só o mês'), (3, '3 meses'), (6, '6 meses'), (12, '12 meses'), (24, '24 meses')]
+MAX_MESES_PERIODO = 36
+
+@login_required
+@cache_por_versao
+async def balanco_mensal(request):
+    user = await _usuario(request)
+    # Modo período (opcional): tabela com os últimos N meses até o mês selecionado
+    try: quantidade_meses = int(request.GET.get('periodo', 1))
+    except ValueError: quantidade_meses = 1
+    quantidade_meses = max(1, min(quantidade_meses, MAX_MESES_PERIODO))
+
+    anos_meses_disponiveis, ano_default, mes_default = await aget_anos_meses_disponiveis(user)
+    ano_selecionado, mes_selecionado, meses_do_ano_selecionado = _mes_selecionado(request, anos_meses_disponiveis, ano_default, mes_default)
+    # Receitas, à vista e faturas de todo o período numa única consulta (ver lancamentos/balanco.py)
+    balanco_periodo = await abalanco_do_periodo(user, ano_selecionado, mes_selecionado, quantidade_meses)
+    balanco_do_mes = balanco_periodo[-1]
+    total_receitas = balanco_do_mes['total_receitas']
+    total_fatura_mes = balanco_do_mes['total_fatura_mes']
+    total_despesas_avista = balanco_do_mes['total_despesas_avista']
+    total_despesas = balanco_do_mes['total_despesas']
+    saldo = balanco_do_mes['saldo']
     meses_nomes = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
+    for linha in balanco_periodo:
+        linha['mes_nome'] = meses_nomes[linha['mes']]
     meses_para_filtro = {num: meses_nomes[num] for num in sorted(meses_do_ano_selecionado)}
-    context = {'total_receitas': total_receitas, 'total_despesas': total_despesas, 'saldo': saldo, 'anos': sorted(anos_meses_disponiveis.keys(), reverse=True), 'meses': meses_para_filtro.items(), 'mes_selecionado': mes_selecionado, 'ano_selecionado': ano_selecionado, 'mes_selecionado_nome': meses_nomes.get(mes_selecionado), 'total_fatura_mes': total_fatura_mes, 'total_despesas_avista': total_despesas_avista}
-    return render(request, 'lancamentos/balanco_mensal.html', context)
+    context = {'total_receitas': total_receitas, 'total_despesas': total_despesas, 'saldo': saldo, 'anos': sorted(anos_meses_disponiveis.keys(), reverse=True), 'meses': list(meses_para_filtro.items()), 'mes_selecionado': mes_selecionado, 'ano_selecionado': ano_selecionado, 'mes_selecionado_nome': meses_nomes.get(mes_selecionado), 'total_fatura_mes': total_fatura_mes, 'total_despesas_avista': total_despesas_avista, 'periodo': quantidade_meses, 'opcoes_periodo': OPCOES_PERIODO, 'balanco_periodo': balanco_periodo if quantidade_meses > 1 else []}
+    return TemplateResponse(request, 'lancamentos/balanco_mensal.html', context)
 
 # --- VIEWS PARA O CRUD DE CARTÕES ---
 @login_required
+@cache_por_versao
 def lista_cartoes(request):
     user = request.user
-    cartoes = CartaoDeCredito.objects.filter(user=user)
-    
-    cartoes_com_limite = []
+    cartoes = list(CartaoDeCredito.objects.filter(user=user))
     hoje = datetime.date.today()
     
+    # Cada cartão conta as parcelas a partir do seu próximo vencimento
+    referencias = {}
     for cartao in cartoes:
         try: 
             vencimento_este_mes = hoje.replace(day=cartao.dia_vencimento)
@@ -691,46 +741,35 @@ def lista_cartoes(request):
              vencimento_este_mes = primeiro_dia_proximo_mes_temp - relativedelta(days=1)
          
         if hoje.day > cartao.dia_vencimento:
-            data_referencia = vencimento_este_mes + relativedelta(months=1)
+            referencias[cartao.id] = vencimento_este_mes + relativedelta(months=1)
         else:
-            data_referencia = vencimento_este_mes
-        
-        lancamentos_credito = Lancamento.objects.filter(user=user, cartao=cartao)
-        faturas_por_mes = {} 
-        total_faturas_futuras = Decimal('0.0')
+            referencias[cartao.id] = vencimento_este_mes
+
+    # Saldo em aberto de todos os cartões, por mês de vencimento, em uma única consulta agrupada
+    faturas_por_cartao = {cartao.id: [] for cartao in cartoes}
+    if cartoes:
+        filtro_em_aberto = Q()
+        for cartao_id, data_referencia in referencias.items():
+            filtro_em_aberto |= Q(cartao_id=cartao_id, data_vencimento__gte=data_referencia)
+        faturas_em_aberto = Parcela.objects.filter(filtro_em_aberto).annotate(mes=TruncMonth('data_vencimento')).values('cartao_id', 'mes').annotate(total=Sum('valor')).order_by('cartao_id', 'mes')
+        for fatura in faturas_em_aberto:
+            faturas_por_cartao[fatura['cartao_id']].append(fatura)
 
-        for lancamento in lancamentos_credito:
-            if lancamento.num_parcelas > 0: valor_parcela = lancamento.valor_total / lancamento.num_parcelas
-            else: valor_parcela = lancamento.valor_total
-                 
-            primeiro_vencimento = calcular_vencimento_por_cartao(lancamento.data_compra, cartao) 
-            if primeiro_vencimento:
-                for i in range(lancamento.num_parcelas or 1): 
-                    data_vencimento_parcela = primeiro_vencimento + relativedelta(months=i)
-                    
-                    if data_vencimento_parcela >= data_referencia:
-                        total_faturas_futuras += valor_parcela
-                        
-                        mes_key = data_vencimento_parcela.strftime('%Y-%m')
-                        faturas_por_mes[mes_key] = faturas_por_mes.get(mes_key, Decimal('0.0')) + valor_parcela
-        
-        limite_disponivel = cartao.limite - total_faturas_futuras
-        
-        # MUDANÇA: Formata o resumo das faturas para o template
-        meses_nomes_map = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Maio', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'}
+    cartoes_com_limite = []
+    meses_nomes_map = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Maio', 6: 'Jun', 7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'}
+    for cartao in cartoes:
+        total_faturas_futuras = Decimal('0.0')
         resumo_faturas = []
-        for mes_key, total in sorted(faturas_por_mes.items()): 
-            try:
-                ano, mes = map(int, mes_key.split('-'))
-                resumo_faturas.append({
-                    'mes_ano_str': f"{meses_nomes_map.get(mes, '?')}/{ano}", 
-                    'total': total
-                })
-            except ValueError:
-                 print(f"Erro ao processar chave de mês: {mes_key}") 
+        for fatura in faturas_por_cartao[cartao.id]:
+            total_faturas_futuras += fatura['total']
+            # MUDANÇA: Formata o resumo das faturas para o template
+            resumo_faturas.append({
+                'mes_ano_str': f"{meses_nomes_map[fatura['mes'].month]}/{fatura['mes'].year}", 
+                'total': fatura['total']
+            })
 
         cartao.total_faturas_futuras = total_faturas_futuras
-        cartao.limite_disponivel = limite_disponivel
+        cartao.limite_disponivel = cartao.limite - total_faturas_futuras
         cartao.resumo_faturas = resumo_faturas # Anexa o resumo
         
         cartoes_com_limite.append(cartao)
@@ -738,7 +777,7 @@ def lista_cartoes(request):
     context = {
         'cartoes_com_limite': cartoes_com_limite
     }
-    return render(request, 'lancamentos/lista_cartoes.html', context)
+    return TemplateResponse(request, 'lancamentos/lista_cartoes.html', context)
 
 @login_required
 def novo_cartao(request):
@@ -810,4 +849,13 @@ def deletar_cartao(request, pk):
         return redirect('lista_cartoes')
         
     context = {'cartao': cartao, 'erro_lancamentos': False}
-    return render(request, 'lancamentos/cartao_deletar_confirm.html', context)
\ No newline at end of file
+    return render(request, 'lancamentos/cartao_deletar_confirm.html', context)
+
+# --- MÉTRICAS DAS REQUISIÇÕES (staff) ---
+@staff_member_required
+def pagina_de_metricas(request):
+    if request.method == 'POST':
+        metricas.zerar()
+        messages.success(request, 'Métricas zeradas.')
+        return redirect('metricas')
+    return render(request, 'lancamentos/metricas.html', {'estatisticas': metricas.estatisticas()})